@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+from .client import (
+    SendResult,
+    get_retry_after,
+    handle_response,
+    network_error,
+    split_body,
+)
+from .ratelimit import acquire
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+def is_available():
+    """Returns whether the asyncio engine can be used.
+
+    It needs aiohttp, which is installed with the "async" extra.
+    """
+    return aiohttp is not None
+
+
+def send_notifications_async(
+    url,
+    client_secret,
+    batches,
+    event_slug,
+    timeout=None,
+    rate_limit=0,
+    concurrency=10,
+):
+    """Sends several lists of notifications with up to ``concurrency`` requests
+    in flight at once, over a shared pool of keep-alive connections.
+
+    Every list is sent in one API request, and handled just like
+    client.send_notifications does, including the cluster-wide rate
+    limit, retries and splitting up rejected lists. Returns the combined
+    SendResult of all requests.
+    """
+    return asyncio.run(
+        _send_all(
+            url, client_secret, batches, event_slug, timeout, rate_limit, concurrency
+        )
+    )
+
+
+async def _send_all(
+    url, client_secret, batches, event_slug, timeout, rate_limit, concurrency
+):
+    connect_timeout, read_timeout = timeout or (None, None)
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency),
+        timeout=aiohttp.ClientTimeout(
+            sock_connect=connect_timeout, sock_read=read_timeout
+        ),
+        headers={
+            "accept": "application/json",
+            "x-client-secret": client_secret,
+            "Content-Type": "application/json",
+        },
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    result = SendResult()
+    async with session:
+        for batch_result in await asyncio.gather(
+            *(
+                _send(session, semaphore, url, body, event_slug, rate_limit)
+                for body in batches
+                if body
+            )
+        ):
+            result.update(batch_result)
+    return result
+
+
+async def _send(session, semaphore, url, body, event_slug, rate_limit):
+    async with semaphore:
+        if rate_limit:
+            await asyncio.get_running_loop().run_in_executor(None, acquire, rate_limit)
+        try:
+            async with session.post(url, data=json.dumps(body)) as response:
+                try:
+                    content = await response.json(content_type=None)
+                except Exception:
+                    content = None
+                status_code = response.status
+                retry_after = get_retry_after(response)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return network_error(body, event_slug, e)
+
+    result = handle_response(body, status_code, content, retry_after, event_slug)
+    if result is None:
+        result = SendResult()
+        for part_result in await asyncio.gather(
+            *(
+                _send(session, semaphore, url, part, event_slug, rate_limit)
+                for part in split_body(body, status_code)
+            )
+        ):
+            result.update(part_result)
+    return result
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import requests
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import acquire
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://notify.lab.juvare.com/manage/"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Responses that may be caused by a single invalid notification in a batch,
+# or by the batch being too large
+SPLIT_STATUS_CODES = (400, 413, 422)
+
+_sessions = {}
+
+
+def get_session(pool_size=10):
+    """Returns a keep-alive session for the current worker process.
+
+    Sessions are kept per process ID, as connection pools must not be
+    shared with forked children.
+    """
+    key = (os.getpid(), pool_size)
+    session = _sessions.get(key)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _sessions[key] = session
+    return session
+
+
+def get_notification_url(api_url):
+    url = api_url or DEFAULT_API_URL
+    if url[-1] != "/":
+        url += "/"
+    return url + "api/v3/notification"
+
+
+def build_notification(text, to, billing_id):
+    return {
+        "type": "sms",
+        "addresses": [to.replace(" ", "")],
+        "message": text,
+        "repeatCount": 0,
+        "repeatDelay": 0,
+        "consentless": True,
+        "billingId": billing_id,
+    }
+
+
+def _post(session, url, client_secret, body, timeout):
+    return session.post(
+        url,
+        data=json.dumps(body),
+        headers={
+            "accept": "application/json",
+            "x-client-secret": client_secret,
+            "Content-Type": "application/json",
+        },
+        timeout=timeout,
+    )
+
+
+def _entry_error(result):
+    """Returns the error reported for a single notification, if any."""
+    if not isinstance(result, dict):
+        return None
+    return result.get("error") or result.get("errors")
+
+
+def _entry_id(result):
+    """Returns the ID the API assigned to a single notification, if any."""
+    if not isinstance(result, dict) or result.get("id") is None:
+        return None
+    return str(result["id"])
+
+
+class SendResult:
+    """The outcome of sending a list of notifications.
+
+    ``delivered`` holds (notification, ID) pairs of the notifications
+    the API accepted, with the ID the API assigned to them, if any.
+    ``failed`` holds (notification, error) pairs that were rejected for
+    good, ``retry`` holds the notifications that hit a transient error
+    and may be sent again later, no earlier than ``retry_after`` seconds
+    from now, if the API asked for that.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.delivered = []
+        self.failed = []
+        self.retry = []
+        self.retry_after = None
+
+    def update(self, other):
+        self.sent += other.sent
+        self.delivered += other.delivered
+        self.failed += other.failed
+        self.retry += other.retry
+        if other.retry_after is not None:
+            self.retry_after = max(self.retry_after or 0, other.retry_after)
+
+
+def get_retry_after(response):
+    """Returns the Retry-After header of a response in seconds, if set."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(int((retry_at - datetime.now(timezone.utc)).total_seconds()), 0)
+
+
+def network_error(body, event_slug, error):
+    """Returns the result of a request that did not reach the API: all
+    notifications will be retried."""
+    logger.warning(
+        f"Failed to send {len(body)} Juvare Notify message(s) with billing ID {body[0]['billingId']} for {event_slug}. "
+        f"Could not reach the API: {error}"
+    )
+    result = SendResult()
+    result.retry = list(body)
+    return result
+
+
+def handle_response(body, status_code, content, retry_after, event_slug):
+    """Turns an API response into a SendResult.
+
+    ``content`` is the parsed JSON body of the response, or None if it
+    had none. Returns None if the notifications should be sent again in
+    the parts returned by split_body.
+    """
+    result = SendResult()
+    billing_id = body[0]["billingId"]
+    if status_code >= 400:
+        if status_code in RETRY_STATUS_CODES:
+            logger.warning(
+                f"Failed to send {len(body)} Juvare Notify message(s) with billing ID {billing_id} for {event_slug}. "
+                f"Received API response {status_code}, will try again later."
+            )
+            result.retry = list(body)
+            result.retry_after = retry_after
+            return result
+        if len(body) > 1 and status_code in SPLIT_STATUS_CODES:
+            return None
+        message = f"Failed to send {len(body)} Juvare Notify message(s) with billing ID {billing_id} for {event_slug}. "
+        message += f"Received API response {status_code}. "
+        if content is None:
+            message += "It had no readable JSON body with details."
+        elif isinstance(content, dict) and content.get("message"):
+            message += f"It said: {content['message']}"
+        else:
+            message += "It contained no further message to explain the error."
+        logger.error(message)
+        result.failed = [(notification, message) for notification in body]
+        return result
+
+    if isinstance(content, list) and len(content) == len(body):
+        for notification, entry in zip(body, content):
+            error = _entry_error(entry)
+            if error:
+                result.failed.append((notification, str(error)))
+                logger.error(
+                    f"Juvare Notify rejected the message to {notification['addresses'][0]} "
+                    f"with billing ID {billing_id} for {event_slug}: {error}"
+                )
+            else:
+                result.delivered.append((notification, _entry_id(entry)))
+    else:
+        result.delivered = [(notification, None) for notification in body]
+    result.sent = len(result.delivered)
+
+    message = f"SUCCESS: Sent {result.sent} Juvare Notify message(s) with billing ID: {billing_id} for {event_slug}. "
+    if content:
+        message += f"Response: {content}"
+    else:
+        message += "No details were provided."
+    logger.info(message)
+    return result
+
+
+def split_body(body, status_code):
+    """Returns the parts a rejected list of notifications is sent again in.
+
+    Lists that were too large are halved, others are split into single
+    notifications.
+    """
+    if status_code == 413:
+        middle = len(body) // 2
+        return [body[:middle], body[middle:]]
+    return [[notification] for notification in body]
+
+
+def send_notifications(
+    session, url, client_secret, body, event_slug, timeout=None, rate_limit=0
+):
+    """Sends a list of notifications in a single API request.
+
+    Waits for the cluster-wide rate limit (in requests per second)
+    before sending. Network errors, timeouts and the status codes in
+    RETRY_STATUS_CODES mark the notifications for a later retry. If the
+    API rejects a request containing several notifications as malformed
+    or too large (SPLIT_STATUS_CODES), they are sent again in smaller
+    parts, so that a single broken entry does not take the rest of the
+    batch down with it. Any other error fails the whole batch.
+    """
+    if not body:
+        return SendResult()
+    acquire(rate_limit)
+    try:
+        response = _post(session, url, client_secret, body, timeout)
+    except requests.RequestException as e:
+        return network_error(body, event_slug, e)
+    try:
+        content = response.json()
+    except Exception:
+        content = None
+
+    result = handle_response(
+        body, response.status_code, content, get_retry_after(response), event_slug
+    )
+    if result is None:
+        result = SendResult()
+        for part in split_body(body, response.status_code):
+            result.update(
+                send_notifications(
+                    session,
+                    url,
+                    client_secret,
+                    part,
+                    event_slug,
+                    timeout=timeout,
+                    rate_limit=rate_limit,
+                )
+            )
+    return result
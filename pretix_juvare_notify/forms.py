@@ -3,15 +3,32 @@ from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _, pgettext_lazy
 from i18nfield.forms import I18nFormField, I18nTextarea
-from pretix.base.email import get_available_placeholders
 from pretix.base.forms import PlaceholderValidator, SettingsForm
 from pretix.base.forms.widgets import SplitDateTimePickerWidget
 from pretix.base.models import Item, Order, SubEvent
 from pretix.base.settings import GlobalSettingsObject
 from pretix.control.forms.widgets import Select2
 
+from .aio import is_available
+from .profiles import get_transport_file, invalidate_send_profiles
+from .rendering import get_placeholder_names
+
 
 class JuvareGlobalSettingsForm(SettingsForm):
+    juvare_transport = forms.ChoiceField(
+        label=_("Transport"),
+        help_text=_(
+            "Use one of the test transports to run the whole sending process without sending any SMS, "
+            "for example for load tests or in staging. The file transport writes to the file set as "
+            "transport_file in the [juvare_notify] section of the pretix configuration file."
+        ),
+        choices=(
+            ("juvare", _("Juvare Notify API")),
+            ("null", _("Discard all messages, and only log how many were sent")),
+            ("file", _("Append all messages to a file (JSON lines)")),
+        ),
+        required=False,
+    )
     juvare_api_url = forms.URLField(
         label=_("API URL"),
         help_text=_(
@@ -19,6 +36,47 @@ class JuvareGlobalSettingsForm(SettingsForm):
         ),
         required=True,
     )
+    juvare_api_connect_timeout = forms.IntegerField(
+        label=_("Connection timeout"),
+        help_text=_(
+            "How many seconds to wait for a connection to the API before giving up."
+        ),
+        min_value=1,
+        required=False,
+    )
+    juvare_api_read_timeout = forms.IntegerField(
+        label=_("Response timeout"),
+        help_text=_("How many seconds to wait for an API response before giving up."),
+        min_value=1,
+        required=False,
+    )
+    juvare_api_pool_size = forms.IntegerField(
+        label=_("Connection pool size"),
+        help_text=_(
+            "How many connections to the API each worker process will keep open for reuse."
+        ),
+        min_value=1,
+        max_value=100,
+        required=False,
+    )
+    juvare_api_rate_limit = forms.IntegerField(
+        label=_("Rate limit"),
+        help_text=_(
+            "How many requests per second may be sent to the API, across all workers. Leave empty or set to 0 to disable the limit."
+        ),
+        min_value=0,
+        required=False,
+    )
+    juvare_api_concurrency = forms.IntegerField(
+        label=_("Concurrent requests"),
+        help_text=_(
+            "How many requests each worker may have in flight at once when sending batches of messages. "
+            "Values above 1 require aiohttp, which is installed with the 'async' extra of this plugin."
+        ),
+        min_value=1,
+        max_value=1000,
+        required=False,
+    )
     juvare_client_secret = forms.CharField(
         label=_("Client secret"),
         required=False,
@@ -31,6 +89,15 @@ class JuvareGlobalSettingsForm(SettingsForm):
             }
         ),
     )
+    juvare_batch_size = forms.IntegerField(
+        label=_("Batch size"),
+        help_text=_(
+            "How many SMS will be sent to the Juvare Notify API in a single request when sending bulk messages."
+        ),
+        min_value=1,
+        max_value=1000,
+        required=False,
+    )
 
     def __init__(self, *args, **kwargs):
         self.obj = GlobalSettingsObject()
@@ -40,12 +107,33 @@ class JuvareGlobalSettingsForm(SettingsForm):
                 "placeholder"
             ] = "•••••••••••"
 
+    def clean_juvare_api_concurrency(self):
+        value = self.cleaned_data.get("juvare_api_concurrency")
+        if value and value > 1 and not is_available():
+            raise ValidationError(
+                _("Please install aiohttp to send more than one request at once.")
+            )
+        return value
+
     def clean(self):
         data = super().clean()
         if not data.get("juvare_client_secret"):
             data["juvare_client_secret"] = self.initial.get("juvare_client_secret")
+        if data.get("juvare_transport") == "file" and not get_transport_file():
+            raise ValidationError(
+                {
+                    "juvare_transport": _(
+                        "Please set transport_file in the [juvare_notify] section of the pretix "
+                        "configuration file to use the file transport."
+                    )
+                }
+            )
         return data
 
+    def save(self):
+        super().save()
+        invalidate_send_profiles()
+
 
 class JuvareOrganizerSettingsForm(SettingsForm):
     juvare_billing_id = forms.CharField(
@@ -128,6 +216,10 @@ class JuvareOrganizerSettingsForm(SettingsForm):
         for k, v in self.base_context.items():
             self._set_field_placeholders(k, v)
 
+    def save(self):
+        super().save()
+        invalidate_send_profiles()
+
 
 class JuvareReminderSettingsForm(SettingsForm):
     juvare_send_reminders = forms.BooleanField(
@@ -159,8 +251,7 @@ class JuvareReminderSettingsForm(SettingsForm):
         super().__init__(*args, **kwargs)
         # if we had an event:
         phs = [
-            "{%s}" % ph
-            for ph in get_available_placeholders(self.event, ["event", "order"]).keys()
+            "{%s}" % ph for ph in get_placeholder_names(self.event, ["event", "order"])
         ]
         self.fields["juvare_reminder_text"].validators.append(PlaceholderValidator(phs))
         self.fields["juvare_reminder_text"].help_text = _(
@@ -245,13 +336,26 @@ class SMSForm(forms.Form):
             )
         return d
 
+    def get_filters(self):
+        """Returns the recipient filters of this form in a JSON serializable
+        form, as expected by tasks.get_campaign_orders."""
+        d = self.cleaned_data
+
+        def isoformat(value):
+            return value.isoformat() if value else None
+
+        return {
+            "sendto": list(d["sendto"]),
+            "items": [i.pk for i in d.get("items") or []],
+            "subevent": d["subevent"].pk if d.get("subevent") else None,
+            "subevents_from": isoformat(d.get("subevents_from")),
+            "subevents_to": isoformat(d.get("subevents_to")),
+            "created_from": isoformat(d.get("created_from")),
+            "created_to": isoformat(d.get("created_to")),
+        }
+
     def _set_field_placeholders(self, fn, base_parameters):
-        phs = [
-            "{%s}" % p
-            for p in sorted(
-                get_available_placeholders(self.event, base_parameters).keys()
-            )
-        ]
+        phs = ["{%s}" % p for p in get_placeholder_names(self.event, base_parameters)]
         ht = _("Available placeholders: {list}").format(list=", ".join(phs))
         if self.fields[fn].help_text:
             self.fields[fn].help_text += " " + str(ht)
@@ -1,11 +1,58 @@
 import csv
 import pathlib
+import shutil
 import sys
-from django.core.management.base import BaseCommand
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
 from django_scopes import scopes_disabled
+from pretix.base.models import Event, Order
 from pretix.base.models.log import LogEntry
+from pretix.base.settings import GlobalSettingsObject
 from pretix.multidomain.urlreverse import build_absolute_uri
 
+WATERMARK_SETTING = "juvare_export_mismatches_watermark"
+
+
+class CSVExport:
+    """Writes CSV rows as they come in.
+
+    The file is only created once the first row is written. Without a
+    location, rows are spooled to a temporary file and copied to stdout
+    when the export is closed, so that several exports can be filled at
+    the same time without keeping them in memory.
+    """
+
+    def __init__(self, fieldnames, filename, location):
+        self.fieldnames = fieldnames
+        self.filename = filename
+        self.location = location
+        self.count = 0
+        self.file = None
+        self.writer = None
+
+    def write(self, row):
+        if self.writer is None:
+            if self.location:
+                self.file = open(pathlib.Path(self.location) / self.filename, "w")
+            else:
+                self.file = tempfile.TemporaryFile(mode="w+")
+            self.writer = csv.DictWriter(
+                self.file, fieldnames=self.fieldnames, extrasaction="ignore"
+            )
+            self.writer.writeheader()
+        self.writer.writerow(row)
+        self.count += 1
+
+    def close(self):
+        if self.file is None:
+            return
+        if not self.location:
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, sys.stdout)
+        self.file.close()
+
 
 class Command(BaseCommand):
     help = "Exports logs of sent bulk messages with recipient/URL mismatches."
@@ -21,91 +68,121 @@ class Command(BaseCommand):
             help="Place the file here instead of writing to stdout",
             default=None,
         )
+        parser.add_argument(
+            "--event",
+            help="Only export messages of the event with this slug",
+            default=None,
+        )
+        parser.add_argument(
+            "--since",
+            help="Only export messages sent after this date and time (ISO 8601)",
+            default=None,
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only export messages that were not part of the last incremental export",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="How many log entries to load at once",
+            default=1000,
+        )
 
     @scopes_disabled()
     def handle(self, *args, **options):
         export_messages = options.get("with_messages")
         location = options.get("location")
+
         all_bulk_send_logs = LogEntry.objects.filter(
             action_type="pretix.plugins.pretix_juvare_notify.order.sms.sent"
-        ).select_related("event")
-        print(f"Total sent bulk SMS: {len(all_bulk_send_logs)}")
-
-        broken_recipient = []
-        broken_url = []
-
-        for log in all_bulk_send_logs:
-            order = log.content_object
-            content = log.parsed_data.get("message")
-            if not content:
-                continue
-            if log.parsed_data.get("recipient") != order.phone:
-                broken_recipient.append(
-                    {
-                        "order": order.code,
-                        "event": log.event.slug,
-                        "order.phone": order.phone,
-                        "recipient": log.parsed_data.get("recipient"),
-                        "timestamp": log.datetime.isoformat(),
-                        "message": log.parsed_data.get("message"),
-                    }
-                )
-            if "https://" in content:
-                target_url = build_absolute_uri(
-                    log.event,
-                    "presale:event.order.open",
-                    kwargs={
-                        "order": order.code,
-                        "secret": order.secret,
-                        "hash": order.email_confirm_hash(),
-                    },
+        )
+        watermark_store = GlobalSettingsObject()
+        if options.get("event"):
+            try:
+                event = Event.objects.get(slug=options["event"])
+            except Event.DoesNotExist:
+                raise CommandError(f"Event {options['event']} does not exist.")
+            except Event.MultipleObjectsReturned:
+                raise CommandError(
+                    f"There are several events with the slug {options['event']}."
                 )
-                if target_url not in content:
-                    broken_url.append(
-                        {
+            all_bulk_send_logs = all_bulk_send_logs.filter(event=event)
+            watermark_store = event
+        if options.get("since"):
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError(f"Could not parse date: {options['since']}")
+            if is_naive(since):
+                since = make_aware(since)
+            all_bulk_send_logs = all_bulk_send_logs.filter(datetime__gte=since)
+        watermark = 0
+        if options.get("incremental"):
+            watermark = int(watermark_store.settings.get(WATERMARK_SETTING) or 0)
+            all_bulk_send_logs = all_bulk_send_logs.filter(pk__gt=watermark)
+        print(f"Total sent bulk SMS: {all_bulk_send_logs.count()}")
+
+        fieldnames = ["order", "event", "order.phone", "recipient", "timestamp"]
+        url_fieldnames = fieldnames + ["correct_url"]
+        if export_messages:
+            fieldnames.append("message")
+            url_fieldnames.append("message")
+        broken_recipient = CSVExport(fieldnames, "broken_recipients.csv", location)
+        broken_url = CSVExport(url_fieldnames, "broken_urls.csv", location)
+
+        all_bulk_send_logs = all_bulk_send_logs.select_related(
+            "event", "event__organizer"
+        ).order_by("pk")
+        while True:
+            logs = list(
+                all_bulk_send_logs.filter(pk__gt=watermark)[: options["chunk_size"]]
+            )
+            if not logs:
+                break
+            watermark = logs[-1].pk
+            orders = Order.objects.in_bulk({log.object_id for log in logs})
+            confirm_hashes = {}
+
+            for log in logs:
+                order = orders.get(log.object_id)
+                data = log.parsed_data
+                content = data.get("message")
+                if not order or not content:
+                    continue
+                row = {
+                    "order": order.code,
+                    "event": log.event.slug,
+                    "order.phone": order.phone,
+                    "recipient": data.get("recipient"),
+                    "timestamp": log.datetime.isoformat(),
+                    "message": content,
+                }
+                if data.get("recipient") != order.phone:
+                    broken_recipient.write(row)
+                if "https://" in content:
+                    if order.pk not in confirm_hashes:
+                        confirm_hashes[order.pk] = order.email_confirm_hash()
+                    target_url = build_absolute_uri(
+                        log.event,
+                        "presale:event.order.open",
+                        kwargs={
                             "order": order.code,
-                            "event": log.event.slug,
-                            "order.phone": order.phone,
-                            "recipient": log.parsed_data.get("recipient"),
-                            "timestamp": log.datetime.isoformat(),
-                            "correct_url": target_url,
-                            "message": log.parsed_data.get("message"),
-                        }
+                            "secret": order.secret,
+                            "hash": confirm_hashes[order.pk],
+                        },
                     )
-                    broken_url.append((log, order, target_url))
-
-        def write(fieldnames, data, filename, location):
-            if location:
-                with open(pathlib.Path(location) / filename, "w") as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(data)
-            else:
-                writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(data)
+                    if target_url not in content:
+                        broken_url.write(dict(row, correct_url=target_url))
 
         print(
-            f"Total SMS where the recipient does not match order.phone: {len(broken_recipient)}"
+            f"Total SMS where the recipient does not match order.phone: {broken_recipient.count}"
         )
-        if broken_recipient:
-            fieldnames = ["order", "event", "order.phone", "recipient", "timestamp"]
-            if export_messages:
-                fieldnames.append("message")
-            write(fieldnames, broken_recipient, "broken_recipients.csv", location)
-
+        broken_recipient.close()
         print(
-            f"Total SMS where an included URL does not match order's URL: {len(broken_url)}"
+            f"Total SMS where an included URL does not match order's URL: {broken_url.count}"
         )
-        if broken_url:
-            fieldnames = [
-                "order",
-                "event",
-                "order.phone",
-                "recipient",
-                "timestamp",
-                "correct_url",
-            ]
-            if export_messages:
-                fieldnames.append("message")
-            write(fieldnames, broken_url, "broken_urls.csv", location)
+        broken_url.close()
+
+        if options.get("incremental"):
+            watermark_store.settings.set(WATERMARK_SETTING, watermark)
@@ -0,0 +1,70 @@
+from collections import Counter
+from django.core.management.base import BaseCommand
+from django_scopes import scopes_disabled
+
+from pretix_juvare_notify.models import FailedMessage, update_campaign_counters
+from pretix_juvare_notify.tasks import chunked, juvare_send_batch
+
+
+class Command(BaseCommand):
+    help = "Sends SMS that could not be delivered again, and removes them from the failed message store."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--event",
+            help="Only requeue messages of the event with this slug",
+            default=None,
+        )
+        parser.add_argument(
+            "--organizer",
+            help="Only requeue messages of the organizer with this slug",
+            default=None,
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="How many messages to queue per send task",
+            default=100,
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only show how many messages would be requeued",
+        )
+
+    @scopes_disabled()
+    def handle(self, *args, **options):
+        failed_messages = FailedMessage.objects.all().order_by("event_id", "pk")
+        if options.get("event"):
+            failed_messages = failed_messages.filter(event__slug=options["event"])
+        if options.get("organizer"):
+            failed_messages = failed_messages.filter(
+                event__organizer__slug=options["organizer"]
+            )
+        print(f"Failed messages to requeue: {failed_messages.count()}")
+        if options.get("dry_run"):
+            return
+
+        requeued = 0
+        for batch in chunked(failed_messages.iterator(), options["batch_size"]):
+            by_event = {}
+            for failed_message in batch:
+                by_event.setdefault(failed_message.event_id, []).append(
+                    {
+                        "text": failed_message.text,
+                        "to": failed_message.recipient,
+                        "locale": failed_message.locale,
+                        "order": failed_message.order_id,
+                        "campaign": failed_message.campaign_id,
+                    }
+                )
+            for event, messages in by_event.items():
+                juvare_send_batch(messages=messages, event=event)
+            # Requeued campaign messages are counted again once they are sent
+            for campaign, count in Counter(
+                m.campaign_id for m in batch if m.campaign_id
+            ).items():
+                update_campaign_counters(campaign, failed=-count)
+            FailedMessage.objects.filter(pk__in=[m.pk for m in batch]).delete()
+            requeued += len(batch)
+        print(f"Requeued messages: {requeued}")
@@ -0,0 +1,38 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0183_auto_20210423_0829"),
+        ("pretix_juvare_notify", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FailedMessage",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False
+                    ),
+                ),
+                ("recipient", models.CharField(max_length=190)),
+                ("text", models.TextField()),
+                ("locale", models.CharField(blank=True, max_length=190, null=True)),
+                ("error", models.TextField(blank=True, null=True)),
+                ("attempts", models.PositiveIntegerField(default=1)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="juvare_failed_messages",
+                        to="pretixbase.Event",
+                    ),
+                ),
+            ],
+        ),
+    ]
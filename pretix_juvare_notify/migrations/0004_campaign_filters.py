@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretix_juvare_notify", "0003_campaign"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="campaign",
+            name="filters",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,90 @@
+import django.db.models.deletion
+import json
+from django.db import migrations, models
+from i18nfield.strings import LazyI18nString
+
+
+def campaigns_from_logs(apps, schema_editor):
+    """Turns the log entries that were used for the SMS history into campaigns,
+    so that the history view can show them."""
+    Campaign = apps.get_model("pretix_juvare_notify", "Campaign")
+    LogEntry = apps.get_model("pretixbase", "LogEntry")
+    SubEvent = apps.get_model("pretixbase", "SubEvent")
+
+    logs = LogEntry.objects.filter(
+        action_type="pretix.plugins.pretix_juvare_notify.sent",
+        event__isnull=False,
+    ).order_by("pk")
+    for log in logs.iterator():
+        data = json.loads(log.data or "{}")
+        subevent = (data.get("subevent") or {}).get("id")
+        if subevent and not SubEvent.objects.filter(pk=subevent).exists():
+            subevent = None
+        campaign = Campaign.objects.create(
+            event_id=log.event_id,
+            user_id=log.user_id,
+            subevent_id=subevent,
+            message=LazyI18nString(data.get("message") or ""),
+            filters={
+                "sendto": data.get("sendto") or [],
+                "items": [i["id"] for i in data.get("items") or []],
+                "subevent": subevent,
+                "subevents_from": data.get("subevents_from"),
+                "subevents_to": data.get("subevents_to"),
+                "created_from": data.get("created_from"),
+                "created_to": data.get("created_to"),
+                "filter_checkins": data.get("filter_checkins"),
+                "not_checked_in": data.get("not_checked_in"),
+                "checkin_lists": [i["id"] for i in data.get("checkin_lists") or []],
+            },
+        )
+        Campaign.objects.filter(pk=campaign.pk).update(created=log.datetime)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0183_auto_20210423_0829"),
+        ("pretix_juvare_notify", "0004_campaign_filters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="campaign",
+            name="subevent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="pretixbase.SubEvent",
+            ),
+        ),
+        migrations.AddField(
+            model_name="campaign",
+            name="queued",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="campaign",
+            name="sent",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="campaign",
+            name="failed",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="campaign",
+            name="skipped",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="campaign",
+            index=models.Index(
+                fields=["event", "-created"], name="juvare_campaign_event_idx"
+            ),
+        ),
+        migrations.RunPython(campaigns_from_logs, migrations.RunPython.noop),
+    ]
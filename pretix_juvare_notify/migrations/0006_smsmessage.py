@@ -0,0 +1,87 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0183_auto_20210423_0829"),
+        ("pretix_juvare_notify", "0005_campaign_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SMSMessage",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False
+                    ),
+                ),
+                ("phone", models.CharField(max_length=190)),
+                ("text", models.TextField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("s", "sent"), ("f", "failed")],
+                        max_length=3,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "provider_id",
+                    models.CharField(blank=True, max_length=190, null=True),
+                ),
+                ("error", models.TextField(blank=True, null=True)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                (
+                    "campaign",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="messages",
+                        to="pretix_juvare_notify.Campaign",
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="juvare_messages",
+                        to="pretixbase.Event",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="juvare_messages",
+                        to="pretixbase.Order",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="smsmessage",
+            index=models.Index(
+                fields=["phone", "created"], name="juvare_message_phone_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smsmessage",
+            index=models.Index(
+                fields=["event", "created"], name="juvare_message_event_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smsmessage",
+            index=models.Index(
+                fields=["provider_id"], name="juvare_message_provider_idx"
+            ),
+        ),
+    ]
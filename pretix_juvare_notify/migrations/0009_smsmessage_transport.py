@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretix_juvare_notify", "0008_failedmessage_order_campaign"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smsmessage",
+            name="transport",
+            field=models.CharField(default="juvare", max_length=190),
+        ),
+    ]
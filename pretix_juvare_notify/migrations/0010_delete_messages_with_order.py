@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0195_auto_20210622_1457"),
+        ("pretix_juvare_notify", "0009_smsmessage_transport"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="failedmessage",
+            name="order",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="pretixbase.order",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="smsmessage",
+            name="order",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="juvare_messages",
+                to="pretixbase.order",
+            ),
+        ),
+    ]
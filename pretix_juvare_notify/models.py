@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _, pgettext_lazy
-from django_scopes import ScopedManager
-from pretix.base.models.event import SubEvent
+from django_scopes import ScopedManager, scopes_disabled
+from i18nfield.fields import I18nTextField
+from pretix.base.models import Order, User
+from pretix.base.models.event import Event, SubEvent
 
 
 class SubEventReminder(models.Model):
@@ -29,3 +32,200 @@ class SubEventReminder(models.Model):
         db_index=True,
     )
     objects = ScopedManager(organizer="subevent__event__organizer")
+
+
+class FailedMessage(models.Model):
+    """An SMS that could not be sent, even after retrying.
+
+    Failed messages can be sent again with the juvare_requeue_failed
+    management command.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="juvare_failed_messages",
+    )
+    order = models.ForeignKey(
+        Order,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    campaign = models.ForeignKey(
+        "Campaign",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    recipient = models.CharField(max_length=190)
+    text = models.TextField()
+    locale = models.CharField(max_length=190, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=1)
+    created = models.DateTimeField(auto_now_add=True)
+    objects = ScopedManager(organizer="event__organizer")
+
+
+class Campaign(models.Model):
+    """A bulk SMS send.
+
+    The recipients are resolved once and stored as CampaignRecipient
+    rows, so that send tasks only need to carry the campaign ID. The
+    send tasks keep the counters up to date: ``queued`` is the number of
+    recipients, which end up as either ``sent``, ``failed`` or
+    ``skipped`` (if they have no valid phone number, or already received
+    the same message for another order). The recipients are removed once
+    all send tasks are done.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="juvare_campaigns",
+    )
+    user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    subevent = models.ForeignKey(
+        SubEvent,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    message = I18nTextField()
+    filters = models.JSONField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    queued = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    objects = ScopedManager(organizer="event__organizer")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["event", "-created"], name="juvare_campaign_event_idx"
+            ),
+        ]
+
+    def add_recipients(self, order_ids, batch_size=1000):
+        batch = []
+        for order_id in order_ids:
+            batch.append(CampaignRecipient(campaign=self, order_id=order_id))
+            if len(batch) >= batch_size:
+                CampaignRecipient.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            CampaignRecipient.objects.bulk_create(batch)
+
+
+class CampaignRecipient(models.Model):
+    campaign = models.ForeignKey(
+        Campaign,
+        on_delete=models.CASCADE,
+        related_name="recipients",
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="juvare_campaign_recipients",
+    )
+
+
+class OutboxMessage(models.Model):
+    """An order notification that waits to be queued.
+
+    Outbox messages are written in the transaction of the order change
+    that caused them, and relayed to the task queue after a short
+    coalescing window by tasks.juvare_relay_outbox.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    template_name = models.CharField(max_length=190)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    objects = ScopedManager(organizer="event__organizer")
+
+
+def update_campaign_counters(campaign, **counters):
+    """Adds to the counters of a campaign in a single query, without loading
+    it."""
+    counters = {k: F(k) + v for k, v in counters.items() if v}
+    if campaign and counters:
+        with scopes_disabled():
+            Campaign.objects.filter(pk=campaign).update(**counters)
+
+
+class SMSMessage(models.Model):
+    """A single SMS that was handed to the Juvare Notify API, whether it was
+    accepted or not.
+
+    ``transport`` is the transport that handled the message, see
+    transports.TRANSPORTS: messages of the test transports are recorded
+    as sent, although they never reached anyone.
+
+    Messages are deleted with their order, and the SMS data shredder
+    removes the phone numbers and texts of an event's messages.
+    """
+
+    STATUS_SENT = "s"
+    STATUS_FAILED = "f"
+    STATUS_CHOICE = (
+        (STATUS_SENT, _("sent")),
+        (STATUS_FAILED, _("failed")),
+    )
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="juvare_messages",
+    )
+    order = models.ForeignKey(
+        Order,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="juvare_messages",
+    )
+    campaign = models.ForeignKey(
+        Campaign,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="messages",
+    )
+    phone = models.CharField(max_length=190)
+    text = models.TextField()
+    status = models.CharField(
+        max_length=3,
+        choices=STATUS_CHOICE,
+        verbose_name=_("Status"),
+    )
+    provider_id = models.CharField(max_length=190, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    transport = models.CharField(max_length=190, default="juvare")
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    objects = ScopedManager(organizer="event__organizer")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["phone", "created"], name="juvare_message_phone_idx"),
+            models.Index(fields=["event", "created"], name="juvare_message_event_idx"),
+            models.Index(fields=["provider_id"], name="juvare_message_provider_idx"),
+        ]
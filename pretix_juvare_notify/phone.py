@@ -0,0 +1,21 @@
+import phonenumbers
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def normalize_phone(value, region=None):
+    """Returns a phone number in E.164 format, or None if it is not a valid
+    phone number.
+
+    Numbers without a country code are parsed as numbers of the given
+    region.
+    """
+    if not value:
+        return None
+    try:
+        number = phonenumbers.parse(str(value), region or None)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
@@ -0,0 +1,102 @@
+from typing import NamedTuple, Optional, Tuple
+
+import time
+import uuid
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django_scopes import scope, scopes_disabled
+from i18nfield.strings import LazyI18nString
+from pretix.base.models import Event
+
+from .client import get_notification_url
+
+PROFILE_TTL = 300
+GENERATION_KEY = "pretix_juvare_notify:send_profile_generation"
+
+_profiles = {}
+
+
+def get_transport_file():
+    """Returns the file the file transport writes to.
+
+    It is set as ``transport_file`` in the ``[juvare_notify]`` section
+    of the pretix configuration file, and not in the web interface, so
+    that admins cannot make the workers write to arbitrary files.
+    """
+    return django_settings.CONFIG_FILE.get(
+        "juvare_notify", "transport_file", fallback=""
+    )
+
+
+class SendProfile(NamedTuple):
+    """Everything a worker needs to know to send SMS for one event."""
+
+    event_id: int
+    event_slug: str
+    url: str
+    client_secret: str
+    billing_id: str
+    signature: LazyI18nString
+    batch_size: int
+    pool_size: int
+    timeout: Tuple[Optional[int], Optional[int]]
+    rate_limit: int
+    concurrency: int
+    region: Optional[str]
+    transport: str
+    transport_file: str
+
+    def sign(self, text, locale=None):
+        signature = self.signature.localize(locale) if locale else str(self.signature)
+        if signature:
+            return f"{text}\n\n{signature}"
+        return text
+
+
+def _build_profile(event_id):
+    with scopes_disabled():
+        event = Event.objects.select_related("organizer").get(pk=event_id)
+
+    with scope(organizer=event.organizer):
+        settings = event.settings
+        return SendProfile(
+            event_id=event.pk,
+            event_slug=event.slug,
+            url=get_notification_url(settings.juvare_api_url),  # global setting
+            client_secret=settings.juvare_client_secret,  # global setting
+            billing_id=settings.juvare_billing_id,
+            signature=settings.juvare_text_signature,
+            batch_size=max(int(settings.juvare_batch_size), 1),
+            pool_size=max(int(settings.juvare_api_pool_size), 1),
+            timeout=(
+                settings.juvare_api_connect_timeout or None,
+                settings.juvare_api_read_timeout or None,
+            ),
+            rate_limit=int(settings.juvare_api_rate_limit or 0),
+            concurrency=max(int(settings.juvare_api_concurrency or 1), 1),
+            region=settings.region,
+            transport=settings.juvare_transport or "juvare",  # global setting
+            transport_file=get_transport_file(),
+        )
+
+
+def get_send_profile(event_id: int) -> SendProfile:
+    """Returns the send profile of an event, cached in worker memory.
+
+    Cached profiles expire after PROFILE_TTL seconds, or as soon as any
+    process calls invalidate_send_profiles().
+    """
+    generation = cache.get(GENERATION_KEY)
+    cached = _profiles.get(event_id)
+    if cached:
+        expires, cached_generation, profile = cached
+        if expires > time.monotonic() and cached_generation == generation:
+            return profile
+    profile = _build_profile(event_id)
+    _profiles[event_id] = (time.monotonic() + PROFILE_TTL, generation, profile)
+    return profile
+
+
+def invalidate_send_profiles():
+    _profiles.clear()
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,67 @@
+import logging
+import time
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY = "pretix_juvare_notify:ratelimit:{}:{}"
+# The window of one second is made up of slots of a tenth of a second
+SLOTS = 10
+MAX_ATTEMPTS = 3
+
+
+def acquire(rate):
+    """Blocks until the next API request may be sent.
+
+    This is a sliding window counter shared by all processes through the
+    Django cache: requests are counted per tenth of a second, and a
+    request may only be sent if the current slot and the ten slots
+    before it hold no more requests than the rate (requests per second).
+    So no second, including one that spans the boundary between two
+    full seconds, sees more requests than the rate, while a request may
+    have to wait up to a tenth of a second longer than necessary. A rate
+    of 0 disables the limit.
+
+    The limit is only as exact as the cache backend's ``incr()``: with
+    memcached or redis it is atomic, but Django's DatabaseCache reads
+    and writes the counter separately, so concurrent workers may
+    occasionally exceed the rate. If the cache cannot count requests at
+    all (e.g. DummyCache), the limit is not enforced.
+    """
+    if not rate or rate <= 0:
+        return
+    attempts = 0
+    while True:
+        now = time.time()
+        current = int(now * SLOTS)
+        key = KEY.format(rate, current)
+        cache.add(key, 0, timeout=2)
+        try:
+            used = cache.incr(key)
+        except ValueError:  # The key expired or was never stored
+            attempts += 1
+            if attempts >= MAX_ATTEMPTS:
+                logger.warning(
+                    "Could not count Juvare Notify API requests in the cache, "
+                    "sending without rate limit."
+                )
+                return
+            continue
+        slots = list(range(current - SLOTS, current))
+        counts = cache.get_many([KEY.format(rate, slot) for slot in slots])
+        counts = [counts.get(KEY.format(rate, slot), 0) for slot in slots]
+        total = sum(counts) + used
+        if total <= rate:
+            return
+
+        # Give the request back, and wait until enough of the oldest slots
+        # have left the window
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+        for slot, count in zip(slots + [current], counts + [used - 1]):
+            total -= count
+            if total <= rate:
+                break
+        time.sleep(max((slot + SLOTS + 1) / SLOTS - now, 0))
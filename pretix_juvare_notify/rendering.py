@@ -0,0 +1,203 @@
+import hashlib
+from collections import OrderedDict, defaultdict
+from django.utils.translation import get_language
+from pretix.base.email import get_available_placeholders
+from pretix.base.i18n import language
+from pretix.base.models import InvoiceAddress
+from pretix.base.services.mail import TolerantDict
+from pretix.base.signals import register_mail_placeholders
+from string import Formatter
+
+MAX_CACHED_TEMPLATES = 512
+PLACEHOLDER_CACHE_TTL = 600
+
+_compiled = OrderedDict()
+
+
+class CompiledTemplate:
+    """A message text parsed once into literal text and placeholder lookups.
+
+    Rendering behaves like ``text.format_map(TolerantDict(context))``,
+    so unknown placeholders are replaced by their name.
+
+    With ``safe``, rendering behaves like pretix' SafeFormatter, which
+    pretix uses to render email texts: every field is looked up in the
+    context as a whole, so attribute access and indexing are not
+    possible, format specs and conversions are ignored, and unknown
+    placeholders are kept as they are.
+    """
+
+    def __init__(self, text, safe=False):
+        self.text = text
+        self.safe = safe
+        self.parts = []
+        self.placeholders = set()
+        self.needs_formatter = False
+        auto_number = 0
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is None:
+                self.parts.append((literal, None, None, None))
+                continue
+            if safe:
+                if field == "":
+                    field = str(auto_number)
+                    auto_number += 1
+                self.placeholders.add(field)
+                self.parts.append((literal, field, "", None))
+                continue
+            name = field.split(".", 1)[0].split("[", 1)[0]
+            if name != field or not name.isidentifier() or "{" in spec:
+                # Attribute access, indexing, positional fields and nested
+                # format specs are left to str.format_map
+                self.needs_formatter = True
+            self.placeholders.add(name)
+            self.parts.append((literal, field, spec, conversion))
+
+    def render(self, context):
+        if self.needs_formatter:
+            return self.text.format_map(TolerantDict(context))
+        result = []
+        for literal, field, spec, conversion in self.parts:
+            result.append(literal)
+            if field is None:
+                continue
+            if field in context:
+                value = context[field]
+            elif self.safe:
+                value = f"{{{field}}}"
+            else:
+                value = field
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            elif conversion == "s":
+                value = str(value)
+            result.append(format(value, spec))
+        return "".join(result)
+
+
+def compile_template(text: str, safe: bool = False) -> CompiledTemplate:
+    """Returns the compiled version of a message text, cached by content
+    hash."""
+    key = (hashlib.sha1(text.encode()).hexdigest(), safe)
+    template = _compiled.get(key)
+    if template is None:
+        template = CompiledTemplate(text, safe=safe)
+        _compiled[key] = template
+        if len(_compiled) > MAX_CACHED_TEMPLATES:
+            _compiled.popitem(last=False)
+    else:
+        _compiled.move_to_end(key)
+    return template
+
+
+class SMSContext:
+    """Renders only the placeholders a template actually uses.
+
+    This is a demand-driven version of
+    pretix.base.email.get_email_context. Placeholders that only depend
+    on the event are rendered once per language and reused for all
+    orders, so create one instance per event and keep it around for the
+    whole send run.
+    """
+
+    def __init__(self, event):
+        self.event = event
+        self._placeholders = defaultdict(list)
+        for _, val in register_mail_placeholders.send(sender=event):
+            if not isinstance(val, (list, tuple)):
+                val = [val]
+            for v in val:
+                self._placeholders[v.identifier].append(v)
+        self._event_values = {}
+        self._meta_data = None
+
+    @property
+    def meta_data(self):
+        if self._meta_data is None:
+            self._meta_data = self.event.meta_data
+        return self._meta_data
+
+    def _render_event_placeholder(self, placeholder):
+        key = (get_language(), placeholder.identifier)
+        if key not in self._event_values:
+            self._event_values[key] = placeholder.render({"event": self.event})
+        return self._event_values[key]
+
+    def get(self, names, **kwargs):
+        """Returns the context for the given placeholder names.
+
+        Accepts the same keyword arguments as get_email_context.
+        """
+        kwargs["event"] = self.event
+        if "position" in kwargs:
+            kwargs.setdefault("position_or_address", kwargs["position"])
+        if "order" in kwargs and "invoice_address" not in kwargs:
+            try:
+                kwargs["invoice_address"] = kwargs["order"].invoice_address
+            except InvoiceAddress.DoesNotExist:
+                kwargs["invoice_address"] = InvoiceAddress(order=kwargs["order"])
+            kwargs.setdefault("position_or_address", kwargs["invoice_address"])
+
+        context = {}
+        for name in names:
+            # Like get_email_context, the last matching placeholder wins
+            for placeholder in reversed(self._placeholders.get(name, [])):
+                required = placeholder.required_context
+                if not all(r in kwargs for r in required):
+                    continue
+                if set(required) <= {"event"}:
+                    context[name] = self._render_event_placeholder(placeholder)
+                else:
+                    context[name] = placeholder.render(kwargs)
+                break
+            else:
+                if name.startswith("meta_") and name[5:] in self.meta_data:
+                    context[name] = self.meta_data[name[5:]]
+        return context
+
+
+def _placeholder_cache_key(kind, event, base_parameters, *extra):
+    # The event cache is cleared whenever the event or its meta data change.
+    # Settings that change the available placeholders are part of the key.
+    return ":".join(
+        [
+            "pretix_juvare_notify:placeholders",
+            kind,
+            ",".join(sorted(base_parameters)),
+            ",".join(event.settings.locales),
+            event.settings.name_scheme,
+            *extra,
+        ]
+    )
+
+
+def get_placeholder_names(event, base_parameters):
+    """Returns the sorted names of all placeholders available for the given
+    base parameters, cached per event."""
+    return event.cache.get_or_set(
+        _placeholder_cache_key("names", event, base_parameters),
+        lambda: sorted(get_available_placeholders(event, list(base_parameters))),
+        timeout=PLACEHOLDER_CACHE_TTL,
+    )
+
+
+def get_placeholder_samples(event, base_parameters, locale):
+    """Returns the sample values of all placeholders available for the given
+    base parameters, rendered in the given locale and cached per event."""
+
+    def render_samples():
+        with language(locale, event.settings.region):
+            return {
+                k: str(v.render_sample(event))
+                for k, v in get_available_placeholders(
+                    event, list(base_parameters)
+                ).items()
+            }
+
+    return event.cache.get_or_set(
+        _placeholder_cache_key("samples", event, base_parameters, locale),
+        render_samples,
+        timeout=PLACEHOLDER_CACHE_TTL,
+    )
@@ -0,0 +1,47 @@
+from typing import NamedTuple
+
+import math
+
+GSM_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM_EXTENDED = set("^{}\\[~]|€\f")
+GSM7 = "GSM-7"
+UCS2 = "UCS-2"
+SEGMENT_SIZE = {
+    # encoding: (single message, part of a concatenated message)
+    GSM7: (160, 153),
+    UCS2: (70, 67),
+}
+
+
+class SegmentInfo(NamedTuple):
+    encoding: str
+    length: int
+    segments: int
+
+
+def analyze(text: str) -> SegmentInfo:
+    """Returns the encoding an SMS will be sent in, its length in characters of
+    that encoding, and the number of segments it will be split into.
+
+    Characters from the GSM-7 extension table take up two characters. As
+    soon as one character is not part of GSM-7, the whole message is
+    sent as UCS-2, where characters outside the Basic Multilingual Plane
+    (like most emoji) take up two characters.
+    """
+    if all(c in GSM_BASIC or c in GSM_EXTENDED for c in text):
+        encoding = GSM7
+        length = len(text) + sum(1 for c in text if c in GSM_EXTENDED)
+    else:
+        encoding = UCS2
+        length = len(text.encode("utf-16-le")) // 2
+    single, multi = SEGMENT_SIZE[encoding]
+    if not length:
+        segments = 0
+    elif length <= single:
+        segments = 1
+    else:
+        segments = math.ceil(length / multi)
+    return SegmentInfo(encoding, length, segments)
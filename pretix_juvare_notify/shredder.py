@@ -0,0 +1,69 @@
+import json
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from pretix.base.shredder import BaseDataShredder, shred_log_fields
+from pretix.helpers.json import CustomJSONEncoder
+
+from .models import FailedMessage, SMSMessage
+
+LOGGED_ACTION_TYPES = (
+    "pretix.plugins.pretix_juvare_notify.order.sms.sent",
+    "pretix.plugins.pretix_juvare_notify.order.sms.sent.attendee",
+    "pretix_juvare_notify.message.sent",
+    "pretix_juvare_notify.message.failed",
+)
+
+
+class SMSShredder(BaseDataShredder):
+    verbose_name = _("SMS")
+    identifier = "juvare_notify_sms"
+    description = _(
+        "This will remove the phone numbers and texts of all sent SMS, all SMS that could not be sent, "
+        "and the logged SMS contents."
+    )
+
+    def generate_files(self):
+        yield "juvare-sms.json", "application/json", json.dumps(
+            [
+                {
+                    "order": code,
+                    "phone": phone,
+                    "text": text,
+                    "status": status,
+                    "created": created,
+                }
+                for code, phone, text, status, created in SMSMessage.objects.filter(
+                    event=self.event
+                )
+                .order_by("pk")
+                .values_list("order__code", "phone", "text", "status", "created")
+            ],
+            cls=CustomJSONEncoder,
+            indent=4,
+        )
+        yield "juvare-failed-sms.json", "application/json", json.dumps(
+            [
+                {
+                    "order": code,
+                    "phone": phone,
+                    "text": text,
+                    "error": error,
+                    "created": created,
+                }
+                for code, phone, text, error, created in FailedMessage.objects.filter(
+                    event=self.event
+                )
+                .order_by("pk")
+                .values_list("order__code", "recipient", "text", "error", "created")
+            ],
+            cls=CustomJSONEncoder,
+            indent=4,
+        )
+
+    @transaction.atomic
+    def shred_data(self):
+        SMSMessage.objects.filter(event=self.event).update(phone="", text="")
+        # Failed messages cannot be sent again without recipient and text
+        FailedMessage.objects.filter(event=self.event).delete()
+        for le in self.event.logentry_set.filter(action_type__in=LOGGED_ACTION_TYPES):
+            shred_log_fields(le, banlist=["message", "recipient"])
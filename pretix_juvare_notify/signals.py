@@ -1,16 +1,16 @@
 import datetime as dt
 import logging
-from decimal import Decimal
-from django.db.models import Exists, OuterRef
+import time
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from django.dispatch import receiver
 from django.urls import resolve, reverse
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from django_scopes import scopes_disabled
 from i18nfield.strings import LazyI18nString
-from pretix.base.email import get_email_context
-from pretix.base.i18n import language
-from pretix.base.services.mail import render_mail
 from pretix.base.settings import settings_hierarkey
 from pretix.base.signals import (
     logentry_display,
@@ -19,6 +19,7 @@ from pretix.base.signals import (
     order_paid,
     order_placed,
     periodic_task,
+    register_data_shredders,
 )
 from pretix.control.signals import (
     nav_event,
@@ -44,6 +45,13 @@ for settings_name in JUVARE_TEMPLATES:
 settings_hierarkey.add_default("juvare_send_reminders", "false", bool)
 settings_hierarkey.add_default("juvare_reminder_interval", "0", int)
 settings_hierarkey.add_default("juvare_reminder_interval_cutoff", "0", int)
+settings_hierarkey.add_default("juvare_batch_size", "100", int)
+settings_hierarkey.add_default("juvare_api_pool_size", "10", int)
+settings_hierarkey.add_default("juvare_api_connect_timeout", "5", int)
+settings_hierarkey.add_default("juvare_api_read_timeout", "30", int)
+settings_hierarkey.add_default("juvare_api_rate_limit", "0", int)
+settings_hierarkey.add_default("juvare_api_concurrency", "1", int)
+settings_hierarkey.add_default("juvare_transport", "juvare", str)
 
 logger = logging.getLogger(__name__)
 
@@ -179,10 +187,19 @@ def control_nav_import(sender, request=None, **kwargs):
     ]
 
 
+@receiver(register_data_shredders, dispatch_uid="juvare_register_shredders")
+def register_shredders(sender, **kwargs):
+    from .shredder import SMSShredder
+
+    return [SMSShredder]
+
+
 @receiver(signal=logentry_display)
 def pretixcontrol_logentry_display(sender, logentry, **kwargs):
     plains = {
         "pretix.plugins.pretix_juvare_notify.sent": _("SMS was sent"),
+        "pretix_juvare_notify.message.sent": _("SMS was sent"),
+        "pretix_juvare_notify.message.failed": _("SMS could not be sent"),
         "pretix.plugins.pretix_juvare_notify.order.sms.sent": _(
             "The order received a mass SMS."
         ),
@@ -194,50 +211,49 @@ def pretixcontrol_logentry_display(sender, logentry, **kwargs):
         return plains[logentry.action_type]
 
 
-def juvare_order_message(order, template_name):
-    from .tasks import juvare_send
+def relay_outbox():
+    """Queues a relay of the outbox for the messages added during the current
+    coalescing window.
 
-    recipient = order.phone
-    if not order.phone:
+    Only one relay is queued per window. It runs a little after the last
+    message added in the window is due, to be sure to include it.
+    """
+    from .tasks import COALESCE_WINDOW, RELAY_KEY, RELAY_MARGIN, juvare_relay_outbox
+
+    window_end = (int(time.time() // COALESCE_WINDOW) + 1) * COALESCE_WINDOW
+    key = RELAY_KEY.format(window_end)
+    if not cache.add(key, True, timeout=3 * COALESCE_WINDOW):
         return
+    try:
+        juvare_relay_outbox.apply_async(
+            countdown=window_end - time.time() + COALESCE_WINDOW + RELAY_MARGIN
+        )
+    except Exception:
+        # The periodic task will relay the messages once the broker is back
+        cache.delete(key)
+        logger.exception("Could not queue the Juvare Notify outbox relay.")
 
-    context = get_email_context(event=order.event, order=order)
-    for k, v in order.event.meta_data.items():
-        context["meta_" + k] = v
 
-    with language(order.locale, order.event.settings.region):
-        template = order.event.settings.get(f"juvare_text_{template_name}")
-        if not str(template):
-            return
+def juvare_order_message(order, template_name):
+    """Adds an order notification to the outbox, in the same transaction as the
+    order change that caused it.
 
-        try:
-            content = render_mail(template, context)
-            juvare_send(text=content, to=str(recipient), event=order.event_id)
-        except Exception:
-            raise
-        else:
-            order.log_action(
-                "pretix_juvare_notify.message.sent",
-                data={
-                    "message": content,
-                    "recipient": str(recipient),
-                    "order": order.code,
-                },
-            )
+    Everything else happens in the worker, to keep the checkout fast.
+    """
+    from .models import OutboxMessage
+
+    if not order.phone:
+        return
+    OutboxMessage.objects.create(
+        event_id=order.event_id, order=order, template_name=template_name
+    )
+    transaction.on_commit(relay_outbox)
 
 
 @receiver(order_placed, dispatch_uid="juvare_order_placed")
 def juvare_order_placed(order, sender, **kwargs):
-    payment = order.payments.first()
-    if (
-        payment
-        and payment.provider == "free"
-        and order.pending_sum == Decimal("0.00")
-        and not order.require_approval
-    ):
-        juvare_order_message(order, "order_free")
-    else:
-        juvare_order_message(order, "order_placed")
+    # Whether the order is free is decided by the worker
+    juvare_order_message(order, "order_placed")
 
 
 @receiver(order_paid, dispatch_uid="juvare_order_paid")
@@ -255,42 +271,63 @@ def juvare_order_changed(order, sender, **kwargs):
     juvare_order_message(order, "order_changed")
 
 
+def get_due_reminder_subevents(_now):
+    """Returns all subevents that are due for a reminder right now.
+
+    The reminder settings of all events with reminders turned on are
+    loaded up front. Events are grouped by their reminder window, and
+    the subevents of all windows are then fetched in one query that only
+    matches subevents inside their window.
+    """
+    from pretix.base.models.event import Event_SettingsStore, SubEvent
+
+    active_events = list(
+        Event_SettingsStore.objects.filter(
+            key="juvare_send_reminders", value="True"
+        ).values_list("object_id", flat=True)
+    )
+    windows = {event_id: {"interval": 0, "cutoff": 0} for event_id in active_events}
+    for event_id, key, value in Event_SettingsStore.objects.filter(
+        object_id__in=active_events,
+        key__in=["juvare_reminder_interval", "juvare_reminder_interval_cutoff"],
+    ).values_list("object_id", "key", "value"):
+        if key == "juvare_reminder_interval":
+            windows[event_id]["interval"] = int(value or 0)
+        else:
+            windows[event_id]["cutoff"] = int(value or 0)
+
+    events_by_window = defaultdict(list)
+    for event_id, window in windows.items():
+        if window["interval"] > window["cutoff"]:
+            events_by_window[(window["interval"], window["cutoff"])].append(event_id)
+    logger.info(f"Checking subevents of {len(windows)} events for reminders.")
+    if not events_by_window:
+        return SubEvent.objects.none()
+
+    query = Q()
+    for (interval, cutoff), event_ids in events_by_window.items():
+        query |= Q(
+            event_id__in=event_ids,
+            date_from__lt=_now + dt.timedelta(hours=interval),
+            date_from__gt=_now + dt.timedelta(hours=max(cutoff, 0)),
+        )
+    return (
+        SubEvent.objects.filter(query, juvare_reminder__isnull=True)
+        .select_related("event")
+        .order_by("date_from")
+    )
+
+
+@receiver(periodic_task, dispatch_uid="juvare_periodic_outbox")
+def juvare_periodic_outbox(*args, **kwargs):
+    relay_outbox()
+
+
 @receiver(periodic_task, dispatch_uid="juvare_periodic_reminder")
 def juvare_periodic_reminder(*args, **kwargs):
-    from pretix.base.models.event import Event, Event_SettingsStore, SubEvent
-
-    logger.info("DUMMY log entry for pretix juvare notify runperiodic")
     with scopes_disabled():
-        active_events = (
-            Event.objects.filter(subevents__isnull=False)
-            .distinct()
-            .annotate(
-                send_reminders=Exists(
-                    Event_SettingsStore.objects.filter(
-                        key="juvare_send_reminders",
-                        value="True",
-                        object_id=OuterRef("pk"),
-                    )
-                )
+        for subevent in get_due_reminder_subevents(now()):
+            send_subevent_reminders.apply_async(kwargs={"subevent": subevent.pk})
+            logger.info(
+                f"Sending reminders for subevent {subevent} ({subevent.event.slug})"
             )
-            .filter(send_reminders=True)
-        )
-        logger.info(f"Checking subevents of {len(active_events)} events for reminders.")
-        _now = now()
-        for subevent in SubEvent.objects.filter(
-            event__in=active_events, juvare_reminder__isnull=True, date_from__gt=_now
-        ):
-            logger.info(f"Checking subevent {subevent} ({subevent.event.slug})")
-            if _now > subevent.date_from - dt.timedelta(
-                hours=int(subevent.event.settings.juvare_reminder_interval)
-            ) and _now < subevent.date_from - dt.timedelta(
-                hours=int(subevent.event.settings.juvare_reminder_interval_cutoff)
-            ):
-                send_subevent_reminders.apply_async(kwargs={"subevent": subevent.pk})
-                logger.info(
-                    f"Sending reminders for subevent {subevent} ({subevent.event.slug})"
-                )
-            else:
-                logger.debug(
-                    f"Not reminders for subevent {subevent} ({subevent.event.slug})"
-                )
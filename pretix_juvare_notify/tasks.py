@@ -1,120 +1,539 @@
-import json
+import hashlib
 import logging
-import requests
-from django.db.models import Exists, OuterRef
+import random
+import time
+from celery import chord
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
 from django_scopes import scope, scopes_disabled
 from i18nfield.strings import LazyI18nString
-from pretix.base.email import get_email_context
 from pretix.base.i18n import language
 from pretix.base.models import (
-    Event,
     InvoiceAddress,
+    LogEntry,
     Order,
     OrderPosition,
     Organizer,
     SubEvent,
-    User,
 )
-from pretix.base.services.mail import TolerantDict
 from pretix.celery_app import app
 
+from .client import build_notification
+from .phone import normalize_phone
+from .profiles import get_send_profile
+from .rendering import SMSContext, compile_template
+from .transports import get_transport
+
 logger = logging.getLogger(__name__)
 
+BULK_CHUNK_SIZE = 1000
+ORDER_FETCH_SIZE = 100
+MAX_SEND_RETRIES = 5
+RETRY_BACKOFF = 30
+DUPLICATE_KEY = "pretix_juvare_notify:campaign:{}:{}"
+DUPLICATE_TIMEOUT = 24 * 3600
+COALESCE_WINDOW = 10
+RELAY_MARGIN = 2
+RELAY_KEY = "pretix_juvare_notify:relay:{}"
+OUTBOX_BATCH_SIZE = 500
+ORDER_DUPLICATE_KEY = "pretix_juvare_notify:order:{}:{}"
+# Order messages are dropped if one of these follows within the window
+SUPERSEDED_BY = {
+    "order_placed": {"order_paid", "order_canceled"},
+    "order_paid": {"order_canceled"},
+    "order_changed": {"order_changed", "order_canceled"},
+}
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_retry_countdown(attempt: int, retry_after: int = None) -> int:
+    """Exponential backoff with jitter, but never sooner than the API asked for
+    in its Retry-After header."""
+    backoff = RETRY_BACKOFF * 2**attempt
+    countdown = random.uniform(backoff / 2, backoff)
+    if retry_after:
+        countdown = max(countdown, retry_after)
+    return int(countdown)
+
+
+def is_duplicate(campaign: int, order: int, phone: str, text: str) -> bool:
+    """Returns whether the same text was already sent to the same phone number
+    as part of a campaign, for a different order.
+
+    Sending to the same order again is not a duplicate, so that chunks
+    can be retried after a worker crashed.
+    """
+    digest = hashlib.sha1(f"{phone}\n{text}".encode()).hexdigest()
+    key = DUPLICATE_KEY.format(campaign, digest)
+    if cache.add(key, order, timeout=DUPLICATE_TIMEOUT):
+        return False
+    return cache.get(key) != order
+
+
+def _count_campaign_results(messages, failed, retry, skipped):
+    """Adds the outcome of a send to the counters of the campaigns the messages
+    belong to.
+
+    Messages that will be retried are counted once they are done.
+    """
+    from .models import update_campaign_counters
+
+    failed = {id(message) for message, error in failed}
+    retry = {id(message) for message in retry}
+    skipped = {id(message) for message in skipped}
+    counters = defaultdict(lambda: {"sent": 0, "failed": 0, "skipped": 0})
+    for message in messages:
+        if not message.get("campaign"):
+            continue
+        if id(message) in skipped:
+            counters[message["campaign"]]["skipped"] += 1
+        elif id(message) in failed:
+            counters[message["campaign"]]["failed"] += 1
+        elif id(message) not in retry:
+            counters[message["campaign"]]["sent"] += 1
+    for campaign, counts in counters.items():
+        update_campaign_counters(campaign, **counts)
+
+
+def _log_order_messages(sent, failed):
+    """Adds the outcome of order notifications to the order log, once it is
+    final.
+
+    Campaign messages are logged when they are queued instead, see
+    send_bulk_sms_chunk.
+    """
+    outcomes = [
+        (message, action_type)
+        for messages, action_type in (
+            (sent, "pretix_juvare_notify.message.sent"),
+            (failed, "pretix_juvare_notify.message.failed"),
+        )
+        for message in messages
+        if message.get("order") and not message.get("campaign")
+    ]
+    if not outcomes:
+        return
+    with scopes_disabled():
+        orders = Order.objects.select_related("event").in_bulk(
+            {message["order"] for message, _ in outcomes}
+        )
+        logs = [
+            orders[message["order"]].log_action(
+                action_type,
+                data={
+                    "message": message["text"],
+                    "recipient": message["to"],
+                    "order": orders[message["order"]].code,
+                },
+                save=False,
+            )
+            for message, action_type in outcomes
+            if message["order"] in orders
+        ]
+        LogEntry.objects.bulk_create(logs)
+
+
+def _write_ledger(event, transport, messages_by_notification, delivered, failed):
+    """Records the notifications the transport accepted or rejected for
+    good."""
+    from .models import SMSMessage
+
+    def entry(notification, **kwargs):
+        message = messages_by_notification[id(notification)]
+        return SMSMessage(
+            event_id=event,
+            order_id=message.get("order"),
+            campaign_id=message.get("campaign"),
+            phone=notification["addresses"][0],
+            text=notification["message"],
+            transport=transport,
+            **kwargs,
+        )
+
+    ledger = [
+        entry(notification, status=SMSMessage.STATUS_SENT, provider_id=provider_id)
+        for notification, provider_id in delivered
+    ]
+    ledger += [
+        entry(notification, status=SMSMessage.STATUS_FAILED, error=error)
+        for notification, error in failed
+    ]
+    if ledger:
+        SMSMessage.objects.bulk_create(ledger)
+
+
+def _send_messages(messages: list, event: int, attempt: int = 0) -> dict:
+    from .models import FailedMessage
+
+    started = time.perf_counter()
+    profile = get_send_profile(event)
+    if profile.transport == "juvare" and not profile.client_secret:
+        return {"sent": 0, "failed": 0, "retry": 0, "invalid": 0}
+
+    body = []
+    messages_by_notification = {}
+    invalid = []
+    for message in messages:
+        to = normalize_phone(message["to"], profile.region)
+        if not to:
+            invalid.append(message)
+            continue
+        notification = build_notification(
+            profile.sign(message["text"], message.get("locale")),
+            to,
+            profile.billing_id,
+        )
+        messages_by_notification[id(notification)] = message
+        body.append(notification)
+    if invalid:
+        logger.warning(
+            f"Dropped {len(invalid)} Juvare Notify message(s) for {profile.event_slug} with invalid phone numbers."
+        )
+
+    transport = get_transport(profile.transport)
+    result = transport.send(
+        profile, list(chunked(body, profile.batch_size)), started=started
+    )
+
+    failed = list(result.failed)
+    retry = list(result.retry)
+    if retry and attempt < MAX_SEND_RETRIES:
+        countdown = get_retry_countdown(attempt, result.retry_after)
+        logger.warning(
+            f"Retrying {len(retry)} Juvare Notify message(s) for {profile.event_slug} in {countdown} seconds."
+        )
+        juvare_send_batch_task.apply_async(
+            kwargs={
+                "messages": [messages_by_notification[id(n)] for n in retry],
+                "event": event,
+                "attempt": attempt + 1,
+            },
+            countdown=countdown,
+        )
+    elif retry:
+        failed += [
+            (notification, "Giving up after too many failed attempts.")
+            for notification in retry
+        ]
+        retry = []
+
+    _write_ledger(
+        event, profile.transport, messages_by_notification, result.delivered, failed
+    )
+    failed = [
+        (messages_by_notification[id(notification)], error)
+        for notification, error in failed
+    ]
+    retry = [messages_by_notification[id(notification)] for notification in retry]
+
+    if failed:
+        FailedMessage.objects.bulk_create(
+            FailedMessage(
+                event_id=event,
+                order_id=message.get("order"),
+                campaign_id=message.get("campaign"),
+                recipient=message["to"],
+                text=message["text"],
+                locale=message.get("locale"),
+                error=error,
+                attempts=attempt + 1,
+            )
+            for message, error in failed
+        )
+    _count_campaign_results(messages, failed, retry, invalid)
+    _log_order_messages(
+        [messages_by_notification[id(n)] for n, _ in result.delivered],
+        [message for message, error in failed] + invalid,
+    )
+    return {
+        "sent": result.sent,
+        "failed": len(failed),
+        "retry": len(retry),
+        "invalid": len(invalid),
+    }
+
 
 @app.task()
-def juvare_send_task(text: str, to: str, event: int):
+def juvare_send_task(
+    text: str, to: str, event: int, locale: str = None, order: int = None
+):
     if not (text and to and event):
         return
+    return _send_messages(
+        [{"text": text, "to": to, "locale": locale, "order": order}], event
+    )
+
+
+@app.task()
+def juvare_send_batch_task(messages: list, event: int, attempt: int = 0):
+    messages = [m for m in messages if m.get("text") and m.get("to")]
+    if not (messages and event):
+        return
+    return _send_messages(messages, event, attempt=attempt)
+
+
+def juvare_send(*args, **kwargs):
+    juvare_send_task.apply_async(args=args, kwargs=kwargs)
+
+
+def juvare_send_batch(*args, **kwargs):
+    juvare_send_batch_task.apply_async(args=args, kwargs=kwargs)
+
+
+def is_free_order(order):
+    payment = order.payments.first()
+    return (
+        payment
+        and payment.provider == "free"
+        and order.pending_sum == Decimal("0.00")
+        and not order.require_approval
+    )
+
+
+def is_superseded(order, template_name, later):
+    """Whether one of the later messages for the same order makes this one
+    redundant.
+
+    Only later messages that have a text in the order's language count.
+    Placed orders that are free are never superseded, as they get the
+    "order_free" text, and pretix reports free orders as paid, too.
+    """
+    if template_name == "order_placed" and is_free_order(order):
+        return False
+    event = order.event
+    with language(order.locale, event.settings.region):
+        return any(str(event.settings.get(f"juvare_text_{name}")) for name in later)
 
+
+@app.task()
+def juvare_order_message_task(order: int, template_name: str):
+    """Renders and sends an order notification.
+
+    Placed orders that are free get the "order_free" text instead.
+    Messages that repeat a text the same recipient just got are dropped.
+    """
     with scopes_disabled():
-        event = Event.objects.get(id=event)
+        order = (
+            Order.objects.select_related("event", "event__organizer")
+            .filter(pk=order)
+            .first()
+        )
+    if not order or not order.phone:
+        return
 
+    event = order.event
     with scope(organizer=event.organizer):
-        client_secret = event.settings.juvare_client_secret  # global setting
-        url = (
-            event.settings.juvare_api_url or "https://notify.lab.juvare.com/manage/"
-        )  # global setting
-        if not (client_secret and url):
+        if template_name == "order_placed" and is_free_order(order):
+            template_name = "order_free"
+
+        with language(order.locale, event.settings.region):
+            template = event.settings.get(f"juvare_text_{template_name}")
+            if not str(template):
+                return
+
+            # Rendered like pretix renders email texts, see render_mail
+            template = compile_template(str(template), safe=True)
+            context = SMSContext(event).get(template.placeholders, order=order)
+            content = template.render(context)
+
+        digest = hashlib.sha1(f"{order.phone}\n{content}".encode()).hexdigest()
+        if not cache.add(
+            ORDER_DUPLICATE_KEY.format(order.pk, digest),
+            True,
+            timeout=6 * COALESCE_WINDOW,
+        ):
+            logger.debug(f"Dropping duplicate SMS for order {order.code}.")
             return
 
-        if url[-1] != "/":
-            url += "/"
-        url += "api/v3/notification"
-
-        to = to.replace(" ", "")
-        if event.settings.juvare_text_signature:
-            text = f"{text}\n\n{event.settings.juvare_text_signature}"
-
-        body = [
-            {
-                "type": "sms",
-                "addresses": [to],
-                "message": text,
-                "repeatCount": 0,
-                "repeatDelay": 0,
-                "consentless": True,
-                "billingId": event.settings.juvare_billing_id,
-            }
-        ]
-        response = requests.post(
-            url,
-            data=json.dumps(body),
-            headers={
-                "accept": "application/json",
-                "x-client-secret": client_secret,
-                "Content-Type": "application/json",
-            },
+        # The order log entry is written once the message was sent or failed
+        # for good, which may only happen in a retry
+        return _send_messages(
+            [
+                {
+                    "text": content,
+                    "to": str(order.phone),
+                    "locale": order.locale,
+                    "order": order.pk,
+                }
+            ],
+            event.pk,
         )
-        try:
-            response.raise_for_status()
-            message = f"SUCCESS: Sent Juvare Notify message with billing ID: {body[0]['billingId']} for {event.slug}. "
-            try:
-                content = response.json()
-                if content:
-                    message += f"Response: {content}"
-                else:
-                    message += "No details were provided."
-            except Exception:
-                message += "No details were provided."
-            logger.info(message)
-        except Exception as e:
-            message = f"Failed to send Juvare Notify message with billing ID {body[0]['billingId']} for {event.slug}. "
-            message += f"Error: {e}. "
-            message += f"Received API response {response.status_code}."
-            try:
-                content = response.json()
-                if content and isinstance(content, dict) and content.get("message"):
-                    message += f"It said: {content['message']}"
-                else:
-                    message += "It contained no further message to explain the error."
-            except Exception:
-                message += "It had no readable JSON body with details."
-            logger.error(message)
 
 
-def juvare_send(*args, **kwargs):
-    juvare_send_task.apply_async(args=args, kwargs=kwargs)
+@app.task()
+def juvare_relay_outbox():
+    """Queues the order notifications in the outbox once their coalescing
+    window is over, and removes them from the outbox.
+
+    Messages are dropped if a message that supersedes them was added to
+    the outbox for the same order later on, see ``is_superseded``. Rows
+    are locked while they are relayed, so that relays can run in
+    parallel, and stay in the outbox if the broker cannot be reached.
+    """
+    from .models import OutboxMessage
+
+    with scopes_disabled():
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    OutboxMessage.objects.select_for_update(skip_locked=True)
+                    .filter(created__lte=now() - timedelta(seconds=COALESCE_WINDOW))
+                    .order_by("pk")[:OUTBOX_BATCH_SIZE]
+                )
+                if not rows:
+                    return
+                queued = defaultdict(list)
+                for pk, order, name in OutboxMessage.objects.filter(
+                    order_id__in={row.order_id for row in rows}
+                ).values_list("pk", "order_id", "template_name"):
+                    queued[order].append((pk, name))
+                later = {
+                    row.pk: {
+                        name
+                        for pk, name in queued[row.order_id]
+                        if pk > row.pk
+                        and name in SUPERSEDED_BY.get(row.template_name, set())
+                    }
+                    for row in rows
+                }
+                orders = Order.objects.select_related(
+                    "event", "event__organizer"
+                ).in_bulk({row.order_id for row in rows if later[row.pk]})
+                for row in rows:
+                    if later[row.pk] and is_superseded(
+                        orders[row.order_id], row.template_name, later[row.pk]
+                    ):
+                        logger.debug(
+                            f"Dropping superseded {row.template_name} SMS for order {row.order_id}."
+                        )
+                        continue
+                    juvare_order_message_task.apply_async(
+                        kwargs={
+                            "order": row.order_id,
+                            "template_name": row.template_name,
+                        }
+                    )
+                OutboxMessage.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+
+def get_campaign_orders(event, filters):
+    """Returns the orders of an event that match the recipient filters of a
+    campaign, see SMSForm.get_filters."""
+    sendto = filters["sendto"]
+    statusq = Q(status__in=sendto)
+    if "overdue" in sendto:
+        statusq |= Q(status=Order.STATUS_PENDING, expires__lt=now())
+    if "pa" in sendto:
+        statusq |= Q(status=Order.STATUS_PENDING, require_approval=True)
+    if "na" in sendto:
+        statusq |= Q(status=Order.STATUS_PENDING, require_approval=False)
+
+    opq = OrderPosition.objects.filter(
+        order=OuterRef("pk"),
+        canceled=False,
+        item_id__in=filters.get("items") or [],
+    )
+    if filters.get("filter_checkins"):
+        ql = []
+        if filters.get("not_checked_in"):
+            ql.append(Q(checkins__list_id=None))
+        if filters.get("checkin_lists"):
+            ql.append(Q(checkins__list_id__in=filters["checkin_lists"]))
+        if len(ql) == 2:
+            opq = opq.filter(ql[0] | ql[1])
+        elif ql:
+            opq = opq.filter(ql[0])
+        else:
+            opq = opq.none()
+    if filters.get("subevent"):
+        opq = opq.filter(subevent_id=filters["subevent"])
+    if filters.get("subevents_from"):
+        opq = opq.filter(
+            subevent__date_from__gte=parse_datetime(filters["subevents_from"])
+        )
+    if filters.get("subevents_to"):
+        opq = opq.filter(
+            subevent__date_from__lt=parse_datetime(filters["subevents_to"])
+        )
+    if filters.get("created_from"):
+        opq = opq.filter(order__datetime__gte=parse_datetime(filters["created_from"]))
+    if filters.get("created_to"):
+        opq = opq.filter(order__datetime__lt=parse_datetime(filters["created_to"]))
+
+    return Order.objects.filter(statusq, Exists(opq), event=event)
+
+
+def iter_orders(event, order_ids, fetch_size=ORDER_FETCH_SIZE):
+    """Yields the orders with the given IDs, fetched in bounded chunks together
+    with the invoice addresses needed for the SMS context."""
+    for ids in chunked(order_ids, fetch_size):
+        orders = (
+            Order.objects.filter(pk__in=ids, event=event)
+            .select_related("invoice_address")
+            .order_by("pk")
+        )
+        for order in orders:
+            order.event = event
+            yield order
+
+
+def _flush_bulk_batch(event, batch, logs):
+    # Log entries are written in one query per batch instead of one per order
+    if logs:
+        LogEntry.objects.bulk_create(logs)
+    if batch:
+        juvare_send_batch(messages=batch, event=event.pk)
 
 
 @app.task(acks_late=True)
-def send_bulk_sms(event: Event, user: int, message: dict, orders: list) -> None:
+def send_bulk_sms_chunk(campaign: int, first: int, last: int) -> dict:
+    """Sends a campaign to the recipients with IDs from first to last."""
+    from .models import Campaign, update_campaign_counters
+
     with scopes_disabled():
-        event = Event.objects.all().select_related("organizer").get(pk=event)
+        campaign = Campaign.objects.select_related(
+            "event", "event__organizer", "user"
+        ).get(pk=campaign)
+    event = campaign.event
 
     with scope(organizer=event.organizer):
-        orders = Order.objects.filter(pk__in=orders, event=event)
-        message = LazyI18nString(message)
-        user = User.objects.get(pk=user) if user else None
-        logger.debug(
-            f"Sending bulk SMS to {len(orders)} recipients for event {event.slug}"
+        message = campaign.message
+        user = campaign.user
+        orders = list(
+            campaign.recipients.filter(pk__gte=first, pk__lte=last)
+            .order_by("pk")
+            .values_list("order_id", flat=True)
         )
 
-        success = 0
-        error = 0
-        skip = 0
-        for o in orders:
-            if not o.phone:
-                skip += 1
+        sms_context = SMSContext(event)
+        region = event.settings.region
+        # With concurrent requests, every send task gets enough messages to
+        # keep them all busy
+        profile = get_send_profile(event.pk)
+        batch_size = profile.batch_size * profile.concurrency
+        batch = []
+        logs = []
+        result = {"success": 0, "error": 0, "skip": 0}
+        for o in iter_orders(event, orders):
+            phone = normalize_phone(o.phone, region) if o.phone else None
+            if not phone:
+                result["skip"] += 1
             else:
                 try:
                     ia = o.invoice_address
@@ -122,31 +541,135 @@ def send_bulk_sms(event: Event, user: int, message: dict, orders: list) -> None:
                     ia = InvoiceAddress(order=o)
 
                 try:
-                    with language(o.locale, event.settings.region):
-                        email_context = get_email_context(
-                            event=event, order=o, position_or_address=ia
+                    with language(o.locale, region):
+                        template = compile_template(str(message))
+                        context = sms_context.get(
+                            template.placeholders,
+                            order=o,
+                            invoice_address=ia,
+                            position_or_address=ia,
+                        )
+                        text = template.render(context)
+                        if is_duplicate(campaign.pk, o.pk, phone, text):
+                            result["skip"] += 1
+                            continue
+                        batch.append(
+                            {
+                                "text": text,
+                                "to": phone,
+                                "locale": o.locale,
+                                "order": o.pk,
+                                "campaign": campaign.pk,
+                            }
                         )
-                        text = str(message).format_map(TolerantDict(email_context))
-                        juvare_send(text=text, to=str(o.phone), event=event.pk)
-                        o.log_action(
-                            "pretix.plugins.pretix_juvare_notify.order.sms.sent",
-                            user=user,
-                            data={"message": text, "recipient": str(o.phone)},
+                        logs.append(
+                            o.log_action(
+                                "pretix.plugins.pretix_juvare_notify.order.sms.sent",
+                                user=user,
+                                data={"message": text, "recipient": str(o.phone)},
+                                save=False,
+                            )
                         )
-                        success += 1
+                        result["success"] += 1
                 except Exception as e:
                     logger.error(
                         f"Failed to send part of a bulk message for order {o.code} ({event.slug}):\n{e}"
                     )
-                    error += 1
-        logger.debug(
-            f"Sending bulk SMS to {len(orders)} recipients for event {event.slug} resulted in {success} successful messages, {error} errors, {skip} skipped."
+                    result["error"] += 1
+            if len(batch) >= batch_size:
+                _flush_bulk_batch(event, batch, logs)
+                batch = []
+                logs = []
+        _flush_bulk_batch(event, batch, logs)
+        update_campaign_counters(
+            campaign.pk, failed=result["error"], skipped=result["skip"]
+        )
+        return result
+
+
+@app.task()
+def send_bulk_sms_summary(results: list, campaign: int) -> dict:
+    """Logs the combined results of all chunks of a campaign, and removes its
+    recipients, as they are no longer needed."""
+    from .models import Campaign, CampaignRecipient
+
+    summary = {"success": 0, "error": 0, "skip": 0}
+    for result in results:
+        for key in summary:
+            summary[key] += result.get(key, 0)
+    with scopes_disabled():
+        slug = (
+            Campaign.objects.filter(pk=campaign)
+            .values_list("event__slug", flat=True)
+            .first()
+        )
+        CampaignRecipient.objects.filter(campaign_id=campaign).delete()
+    logger.info(
+        f"Sending bulk SMS to {sum(summary.values())} recipients for event {slug} resulted in "
+        f"{summary['success']} successful messages, {summary['error']} errors, {summary['skip']} skipped."
+    )
+    return summary
+
+
+@app.task(acks_late=True)
+def send_bulk_sms(
+    campaign: int = None,
+    event: int = None,
+    user: int = None,
+    message: dict = None,
+    orders: list = None,
+) -> None:
+    """Splits a campaign into chunks of recipients that are rendered and sent
+    in parallel, and collects their results once all chunks are done.
+
+    Tasks queued by older versions carry the full recipient list instead
+    of a campaign, and are turned into a campaign first.
+    """
+    from .models import Campaign
+
+    with scopes_disabled():
+        if campaign is None:
+            campaign = Campaign.objects.create(
+                event_id=event, user_id=user, message=LazyI18nString(message)
+            )
+            campaign.add_recipients(orders or [])
+        else:
+            campaign = Campaign.objects.select_related("event").get(pk=campaign)
+            # Recipients are resolved once, and removed after the campaign
+            if (
+                campaign.filters is not None
+                and not campaign.queued
+                and not campaign.recipients.exists()
+            ):
+                with transaction.atomic():
+                    campaign.add_recipients(
+                        get_campaign_orders(campaign.event, campaign.filters)
+                        .order_by("pk")
+                        .values_list("pk", flat=True)
+                        .iterator()
+                    )
+        recipients = (
+            campaign.recipients.order_by("pk").values_list("pk", flat=True).iterator()
         )
+        chunks = []
+        queued = 0
+        for chunk in chunked(recipients, BULK_CHUNK_SIZE):
+            chunks.append(
+                send_bulk_sms_chunk.si(
+                    campaign=campaign.pk, first=chunk[0], last=chunk[-1]
+                )
+            )
+            queued += len(chunk)
+        if not chunks:
+            return
+        Campaign.objects.filter(pk=campaign.pk).update(queued=queued)
+    logger.debug(f"Sending bulk SMS campaign {campaign.pk} in {len(chunks)} chunks")
+    chord(chunks)(send_bulk_sms_summary.s(campaign=campaign.pk))
 
 
 @app.task()
 def send_subevent_reminders(subevent: int):
-    from .models import SubEventReminder
+    from .models import Campaign, SubEventReminder
 
     with scope(
         organizer=Organizer.objects.filter(events__subevents__pk=subevent).first()
@@ -173,16 +696,15 @@ def send_subevent_reminders(subevent: int):
             .filter(match_pos=True)
             .distinct()
         )
-        orders = orders.values_list("pk", flat=True)
-        logger.debug(f"Found {len(orders)} orders to be sent reminders.")
-        if orders:
-            send_bulk_sms.apply_async(
-                kwargs={
-                    "user": None,
-                    "orders": list(orders),
-                    "message": subevent.event.settings.juvare_reminder_text.data,
-                    "event": subevent.event.pk,
-                }
-            )
+        campaign = Campaign.objects.create(
+            event=subevent.event,
+            subevent=subevent,
+            message=subevent.event.settings.juvare_reminder_text,
+        )
+        campaign.add_recipients(orders.values_list("pk", flat=True).iterator())
+        recipient_count = campaign.recipients.count()
+        logger.debug(f"Found {recipient_count} orders to be sent reminders.")
+        if recipient_count:
+            send_bulk_sms.apply_async(kwargs={"campaign": campaign.pk})
         status.status = "f"
         status.save()
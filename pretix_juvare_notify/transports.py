@@ -0,0 +1,109 @@
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from . import aio
+from .client import SendResult, get_session, send_notifications
+
+logger = logging.getLogger(__name__)
+
+
+class JuvareTransport:
+    """Sends notifications to the Juvare Notify API, with the asyncio engine if
+    more than one request may be in flight at once."""
+
+    def send(self, profile, batches, started=None):
+        if profile.concurrency > 1 and len(batches) > 1 and aio.is_available():
+            return aio.send_notifications_async(
+                profile.url,
+                profile.client_secret,
+                batches,
+                profile.event_slug,
+                timeout=profile.timeout,
+                rate_limit=profile.rate_limit,
+                concurrency=profile.concurrency,
+            )
+        session = get_session(profile.pool_size)
+        result = SendResult()
+        for batch in batches:
+            result.update(
+                send_notifications(
+                    session,
+                    profile.url,
+                    profile.client_secret,
+                    batch,
+                    profile.event_slug,
+                    timeout=profile.timeout,
+                    rate_limit=profile.rate_limit,
+                )
+            )
+        return result
+
+
+class NullTransport:
+    """Accepts all notifications without sending them anywhere.
+
+    Logs how many notifications it accepted, and how long the send task
+    took until it got to hand them over.
+    """
+
+    def send(self, profile, batches, started=None):
+        result = SendResult()
+        for batch in batches:
+            result.delivered += [(notification, None) for notification in batch]
+        result.sent = len(result.delivered)
+        message = f"Null transport accepted {result.sent} Juvare Notify message(s) in {len(batches)} batch(es) for {profile.event_slug}"
+        if started:
+            message += f" after {(time.perf_counter() - started) * 1000:.1f} ms"
+        logger.info(message + ".")
+        return result
+
+
+class FileTransport:
+    """Appends all notifications to a file, one JSON object per line."""
+
+    def send(self, profile, batches, started=None):
+        result = SendResult()
+        sent_at = datetime.now(timezone.utc).isoformat()
+        try:
+            with open(profile.transport_file, "a", encoding="utf-8") as f:
+                for batch in batches:
+                    f.write(
+                        "".join(
+                            json.dumps(
+                                {
+                                    "sent_at": sent_at,
+                                    "event": profile.event_slug,
+                                    "notification": notification,
+                                }
+                            )
+                            + "\n"
+                            for notification in batch
+                        )
+                    )
+                    result.delivered += [(notification, None) for notification in batch]
+        except OSError as e:
+            logger.warning(
+                f"Failed to write Juvare Notify message(s) for {profile.event_slug} to {profile.transport_file}: {e}"
+            )
+            delivered = {id(notification) for notification, _ in result.delivered}
+            result.retry = [
+                notification
+                for batch in batches
+                for notification in batch
+                if id(notification) not in delivered
+            ]
+        result.sent = len(result.delivered)
+        return result
+
+
+TRANSPORTS = {
+    "juvare": JuvareTransport,
+    "null": NullTransport,
+    "file": FileTransport,
+}
+
+
+def get_transport(name):
+    return TRANSPORTS.get(name, JuvareTransport)()
@@ -1,15 +1,15 @@
 import logging
+import math
 from django.contrib import messages
-from django.db.models import Exists, OuterRef, Q
+from django.db import transaction
+from django.db.models import Count
 from django.shortcuts import redirect
 from django.urls import reverse
-from django.utils.timezone import now
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import FormView, ListView
-from pretix.base.email import get_available_placeholders
 from pretix.base.i18n import language
-from pretix.base.models import LogEntry, Order, OrderPosition
-from pretix.base.models.event import SubEvent
+from pretix.base.models import Order
 from pretix.base.models.organizer import Organizer
 from pretix.base.services.mail import TolerantDict
 from pretix.base.templatetags.rich_text import markdown_compile_email
@@ -21,8 +21,11 @@ from pretix.control.permissions import (
 from pretix.control.views.organizer import OrganizerDetailViewMixin
 
 from .forms import JuvareReminderSettingsForm, SMSForm
-from .models import SubEventReminder
-from .tasks import send_bulk_sms
+from .models import Campaign, SubEventReminder
+from .profiles import get_send_profile
+from .rendering import get_placeholder_samples
+from .segments import analyze
+from .tasks import get_campaign_orders, send_bulk_sms
 
 logger = logging.getLogger("pretix.plugins.sendmail")
 
@@ -111,104 +114,82 @@ class SenderView(EventPermissionRequiredMixin, FormView):
         return super().form_invalid(form)
 
     def form_valid(self, form):
-        qs = Order.objects.filter(event=self.request.event)
-        statusq = Q(status__in=form.cleaned_data["sendto"])
-        if "overdue" in form.cleaned_data["sendto"]:
-            statusq |= Q(status=Order.STATUS_PENDING, expires__lt=now())
-        if "pa" in form.cleaned_data["sendto"]:
-            statusq |= Q(status=Order.STATUS_PENDING, require_approval=True)
-        if "na" in form.cleaned_data["sendto"]:
-            statusq |= Q(status=Order.STATUS_PENDING, require_approval=False)
-        orders = qs.filter(statusq)
-
-        opq = OrderPosition.objects.filter(
-            order=OuterRef("pk"),
-            canceled=False,
-            item_id__in=[i.pk for i in form.cleaned_data.get("items")],
-        )
-
-        if form.cleaned_data.get("filter_checkins"):
-            ql = []
-            if form.cleaned_data.get("not_checked_in"):
-                ql.append(Q(checkins__list_id=None))
-            if form.cleaned_data.get("checkin_lists"):
-                ql.append(
-                    Q(
-                        checkins__list_id__in=[
-                            i.pk for i in form.cleaned_data.get("checkin_lists", [])
-                        ],
-                    )
-                )
-            if len(ql) == 2:
-                opq = opq.filter(ql[0] | ql[1])
-            elif ql:
-                opq = opq.filter(ql[0])
-            else:
-                opq = opq.none()
-
-        if form.cleaned_data.get("subevent"):
-            opq = opq.filter(subevent=form.cleaned_data.get("subevent"))
-        if form.cleaned_data.get("subevents_from"):
-            opq = opq.filter(
-                subevent__date_from__gte=form.cleaned_data.get("subevents_from")
-            )
-        if form.cleaned_data.get("subevents_to"):
-            opq = opq.filter(
-                subevent__date_from__lt=form.cleaned_data.get("subevents_to")
-            )
-        if form.cleaned_data.get("created_from"):
-            opq = opq.filter(order__datetime__gte=form.cleaned_data.get("created_from"))
-        if form.cleaned_data.get("created_to"):
-            opq = opq.filter(order__datetime__lt=form.cleaned_data.get("created_to"))
-        if form.cleaned_data.get("items"):
-            opq = opq.filter(item__in=form.cleaned_data["items"])
-
-        orders = (
-            orders.annotate(match_pos=Exists(opq)).filter(match_pos=True).distinct()
-        )
+        filters = form.get_filters()
+        orders = get_campaign_orders(self.request.event, filters)
 
         self.output = {}
-        if not orders:
+        if not orders.exists():
             messages.error(
                 self.request, _("There are no orders matching this selection.")
             )
             return self.get(self.request, *self.args, **self.kwargs)
 
         if self.request.POST.get("action") == "preview":
-            for loc in self.request.event.settings.locales:
+            profile = get_send_profile(self.request.event.pk)
+            locales = self.request.event.settings.locales
+            audience = {}
+            for locale, count in (
+                orders.filter(phone__isnull=False)
+                .order_by()
+                .values_list("locale")
+                .annotate(count=Count("pk"))
+            ):
+                if locale not in locales:
+                    locale = self.request.event.settings.locale
+                audience[locale] = audience.get(locale, 0) + count
+            self.estimate = {"messages": sum(audience.values()), "segments": 0}
+
+            for loc in locales:
                 with language(loc, self.request.event.settings.region):
+                    samples = get_placeholder_samples(
+                        self.request.event,
+                        ["event", "order", "position_or_address"],
+                        loc,
+                    )
                     context_dict = TolerantDict()
-                    for k, v in get_available_placeholders(
-                        self.request.event, ["event", "order", "position_or_address"]
-                    ).items():
+                    for k, v in samples.items():
                         context_dict[
                             k
                         ] = '<span class="placeholder" title="{}">{}</span>'.format(
                             _(
                                 "This value will be replaced based on dynamic parameters."
                             ),
-                            v.render_sample(self.request.event),
+                            v,
                         )
 
                     message = form.cleaned_data["message"].localize(loc)
                     preview_text = markdown_compile_email(
                         message.format_map(context_dict)
                     )
+                    segments = analyze(
+                        profile.sign(message.format_map(TolerantDict(samples)), loc)
+                    )
+                    self.estimate["segments"] += segments.segments * audience.get(
+                        loc, 0
+                    )
 
                     self.output[loc] = {
                         "html": preview_text,
+                        "segments": segments,
                     }
 
+            if profile.rate_limit:
+                requests = math.ceil(self.estimate["messages"] / profile.batch_size)
+                self.estimate["minutes"] = math.ceil(requests / profile.rate_limit / 60)
             return self.get(self.request, *self.args, **self.kwargs)
 
-        kwargs = {
-            "event": self.request.event.pk,
-            "user": self.request.user.pk,
-            "message": form.cleaned_data["message"].data,
-            "orders": [o.pk for o in orders],
-        }
-
-        send_bulk_sms.apply_async(kwargs=kwargs)
+        # The recipients are resolved by the worker, so that this request
+        # finishes in constant time regardless of the audience size.
+        campaign = Campaign.objects.create(
+            event=self.request.event,
+            user=self.request.user,
+            subevent=form.cleaned_data.get("subevent"),
+            message=form.cleaned_data["message"],
+            filters=filters,
+        )
+        transaction.on_commit(
+            lambda: send_bulk_sms.apply_async(kwargs={"campaign": campaign.pk})
+        )
         self.request.event.log_action(
             "pretix.plugins.pretix_juvare_notify.sent",
             user=self.request.user,
@@ -217,10 +198,9 @@ class SenderView(EventPermissionRequiredMixin, FormView):
         messages.success(
             self.request,
             _(
-                "Your message has been queued and will be sent to the contact addresses of %d "
-                "orders in the next few minutes."
-            )
-            % len(orders),
+                "Your message has been queued and will be sent to the contact addresses of "
+                "all matching orders in the next few minutes."
+            ),
         )
 
         return redirect(
@@ -232,6 +212,7 @@ class SenderView(EventPermissionRequiredMixin, FormView):
     def get_context_data(self, *args, **kwargs):
         ctx = super().get_context_data(*args, **kwargs)
         ctx["output"] = getattr(self, "output", None)
+        ctx["estimate"] = getattr(self, "estimate", None)
         ctx["has_client_secret"] = bool(
             self.request.organizer.settings.juvare_client_secret
         )
@@ -241,16 +222,16 @@ class SenderView(EventPermissionRequiredMixin, FormView):
 class SMSHistoryView(EventPermissionRequiredMixin, ListView):
     template_name = "pretix_juvare_notify/history.html"
     permission = "can_change_orders"
-    model = LogEntry
-    context_object_name = "logs"
+    model = Campaign
+    context_object_name = "campaigns"
     paginate_by = 5
 
     def get_queryset(self):
-        qs = LogEntry.objects.filter(
-            event=self.request.event,
-            action_type="pretix.plugins.pretix_juvare_notify.sent",
-        ).select_related("event", "user")
-        return qs
+        return (
+            Campaign.objects.filter(event=self.request.event)
+            .select_related("user", "subevent")
+            .order_by("-created")
+        )
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data()
@@ -264,29 +245,27 @@ class SMSHistoryView(EventPermissionRequiredMixin, ListView):
         status["na"] = _("payment pending (except unapproved)")
         status["pa"] = _("approval pending")
         status["r"] = status["c"]
-        for log in ctx["logs"]:
-            log.pdata = log.parsed_data
-            log.pdata["locales"] = {}
-            for locale, msg in log.pdata["message"].items():
-                log.pdata["locales"][locale] = {
-                    "message": msg,
-                }
-            log.pdata["sendto"] = [status[s] for s in log.pdata["sendto"]]
-            log.pdata["items"] = [
-                itemcache.get(i["id"], "?") for i in log.pdata.get("items", [])
-            ]
-            log.pdata["checkin_lists"] = [
-                checkin_list_cache.get(i["id"], "?")
-                for i in log.pdata.get("checkin_lists", [])
-                if i["id"] in checkin_list_cache
+        for campaign in ctx["campaigns"]:
+            filters = campaign.filters or {}
+            campaign.sendto = [status[s] for s in filters.get("sendto", [])]
+            campaign.items = [itemcache.get(i, "?") for i in filters.get("items", [])]
+            campaign.filter_checkins = filters.get("filter_checkins")
+            campaign.not_checked_in = filters.get("not_checked_in")
+            campaign.checkin_lists = [
+                checkin_list_cache[i]
+                for i in filters.get("checkin_lists", [])
+                if i in checkin_list_cache
             ]
-            if log.pdata.get("subevent"):
-                try:
-                    log.pdata["subevent_obj"] = self.request.event.subevents.get(
-                        pk=log.pdata["subevent"]["id"]
-                    )
-                except SubEvent.DoesNotExist:
-                    pass
+            campaign.subevents_from = filters.get("subevents_from") and parse_datetime(
+                filters["subevents_from"]
+            )
+            campaign.subevents_to = filters.get("subevents_to") and parse_datetime(
+                filters["subevents_to"]
+            )
+            if isinstance(campaign.message.data, dict):
+                campaign.locales = campaign.message.data
+            else:
+                campaign.locales = {None: campaign.message.data}
 
         return ctx
 
@@ -37,8 +37,12 @@ setup(
     author_email="r@rixx.de",
     license="Apache",
     install_requires=[
+        "phonenumbers",
         "requests",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+    },
     packages=find_packages(exclude=["tests", "tests.*"]),
     include_package_data=True,
     cmdclass=cmdclass,
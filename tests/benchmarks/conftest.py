@@ -0,0 +1,169 @@
+import json
+import os
+import pytest
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+RESULTS = []
+SIZES = [
+    int(size)
+    for size in os.environ.get("JUVARE_BENCHMARK_SIZES", "1000").split(",")
+    if size.strip()
+]
+BATCH_SIZE = 1000
+
+
+@pytest.fixture
+def fake_api(make_fake_api):
+    return make_fake_api(
+        latency=float(os.environ.get("JUVARE_BENCHMARK_LATENCY", "0")),
+        error_rate=float(os.environ.get("JUVARE_BENCHMARK_ERROR_RATE", "0")),
+    )
+
+
+@pytest.fixture
+def benchmark():
+    """Measures the run time, database queries and peak memory of a stage of
+    the send pipeline."""
+    from django.db import connection
+
+    @contextmanager
+    def measure(stage, size, api=None):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        requests = api.requests if api else 0
+        tracemalloc.start()
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            yield
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        RESULTS.append(
+            {
+                "stage": stage,
+                "size": size,
+                "seconds": round(seconds, 3),
+                "per_second": round(size / seconds, 1) if seconds else None,
+                "queries": queries,
+                "api_requests": api.requests - requests if api else None,
+                "peak_memory_mb": round(peak / 1024 / 1024, 1),
+            }
+        )
+
+    return measure
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f"{size}-orders")
+def synthetic_event(request, db, fake_api):
+    """An event series with the given number of paid orders with phone numbers,
+    spread over one date per thousand orders, all starting within the reminder
+    interval."""
+    from django.core.cache import cache
+    from django.utils.timezone import now
+    from django_scopes import scope, scopes_disabled
+    from i18nfield.strings import LazyI18nString
+    from pretix.base.models import Event, Order, OrderPosition, Organizer
+    from pretix.base.settings import GlobalSettingsObject
+
+    from pretix_juvare_notify.profiles import invalidate_send_profiles
+
+    size = request.param
+    global_settings = GlobalSettingsObject().settings
+    global_settings.juvare_api_url = fake_api.url
+    global_settings.juvare_client_secret = "benchmark"
+    # The fake API listens on a new port for every test, so neither cached
+    # send profiles nor cached settings may survive from the previous one.
+    invalidate_send_profiles()
+    cache.clear()
+
+    organizer = Organizer.objects.create(name="Benchmark", slug="benchmark")
+    organizer.settings.juvare_billing_id = "benchmark"
+    with scope(organizer=organizer):
+        event = Event.objects.create(
+            organizer=organizer,
+            name="Benchmark",
+            slug="benchmark",
+            date_from=now(),
+            has_subevents=True,
+            plugins="pretix_juvare_notify",
+        )
+        event.settings.juvare_text_order_paid = LazyI18nString(
+            {"en": "Your order {code} for {event} has been paid: {url}"}
+        )
+        event.settings.juvare_reminder_text = LazyI18nString(
+            {"en": "See you tomorrow at {event}! Your tickets: {url}"}
+        )
+        event.settings.juvare_send_reminders = True
+        event.settings.juvare_reminder_interval = 48
+        item = event.items.create(name="Ticket", default_price=Decimal("10.00"))
+        subevents = [
+            event.subevents.create(
+                name=f"Date {i}", date_from=now() + timedelta(hours=24), active=True
+            )
+            for i in range(max(size // 1000, 1))
+        ]
+
+    with scopes_disabled():
+        for offset in range(0, size, BATCH_SIZE):
+            Order.objects.bulk_create(
+                Order(
+                    event=event,
+                    code=f"B{n:08d}",
+                    email=f"{n}@example.org",
+                    phone=f"+49151{n:08d}",
+                    status=Order.STATUS_PAID,
+                    locale="en",
+                    datetime=now(),
+                    expires=now() + timedelta(days=10),
+                    total=Decimal("10.00"),
+                )
+                for n in range(offset, min(offset + BATCH_SIZE, size))
+            )
+        order_ids = Order.objects.filter(event=event).order_by("pk")
+        order_ids = order_ids.values_list("pk", flat=True).iterator()
+        positions = []
+        for n, order_id in enumerate(order_ids):
+            positions.append(
+                OrderPosition(
+                    order_id=order_id,
+                    item=item,
+                    subevent=subevents[n % len(subevents)],
+                    price=Decimal("10.00"),
+                    tax_rate=Decimal("0.00"),
+                    tax_value=Decimal("0.00"),
+                    positionid=1,
+                    secret=f"benchmark{n}",
+                    pseudonymization_id=f"B{n:08d}",
+                )
+            )
+            if len(positions) >= BATCH_SIZE:
+                OrderPosition.objects.bulk_create(positions)
+                positions = []
+        OrderPosition.objects.bulk_create(positions)
+
+    return SimpleNamespace(event=event, item=item, subevents=subevents, size=size)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not RESULTS:
+        return
+    columns = list(RESULTS[0])
+    terminalreporter.section("Juvare Notify benchmarks")
+    terminalreporter.write_line(" | ".join(f"{column:>14}" for column in columns))
+    for result in RESULTS:
+        terminalreporter.write_line(
+            " | ".join(f"{str(result[column]):>14}" for column in columns)
+        )
+    if os.environ.get("JUVARE_BENCHMARK_REPORT"):
+        with open(os.environ["JUVARE_BENCHMARK_REPORT"], "w") as f:
+            json.dump(RESULTS, f, indent=2)
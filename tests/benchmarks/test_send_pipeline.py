@@ -0,0 +1,147 @@
+"""Benchmarks for the send pipeline, run against a local fake Juvare API.
+
+They are slow and skipped by default, see the README on how to run them.
+"""
+
+import os
+import pytest
+from datetime import timedelta
+
+pytest.importorskip("pretix")
+
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+from i18nfield.strings import LazyI18nString
+from pretix.base.models import Order
+
+pytestmark = [
+    pytest.mark.skipif(
+        not os.environ.get("JUVARE_BENCHMARK"),
+        reason="Set JUVARE_BENCHMARK=1 to run the benchmarks",
+    ),
+    pytest.mark.django_db,
+]
+
+
+def assert_all_sent(api, size):
+    # With simulated errors, some messages may run out of retries
+    if not api.error_rate:
+        assert api.notifications == size
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_send_bulk_sms(synthetic_event, fake_api, benchmark, concurrency):
+    from pretix.base.settings import GlobalSettingsObject
+
+    from pretix_juvare_notify import aio
+    from pretix_juvare_notify.models import Campaign
+    from pretix_juvare_notify.profiles import invalidate_send_profiles
+    from pretix_juvare_notify.tasks import send_bulk_sms
+
+    stage = "send_bulk_sms"
+    if concurrency > 1:
+        if not aio.is_available():
+            pytest.skip("The asyncio engine needs aiohttp")
+        GlobalSettingsObject().settings.juvare_api_concurrency = concurrency
+        invalidate_send_profiles()
+        stage = f"send_bulk_sms (concurrency {concurrency})"
+
+    campaign = Campaign.objects.create(
+        event=synthetic_event.event,
+        message=LazyI18nString({"en": "Hello {name}, see you soon at {event}!"}),
+        filters={"sendto": ["p"], "items": [synthetic_event.item.pk]},
+    )
+    with benchmark(stage, synthetic_event.size, fake_api):
+        send_bulk_sms.apply(kwargs={"campaign": campaign.pk})
+
+    campaign.refresh_from_db()
+    assert campaign.queued == synthetic_event.size
+    assert campaign.sent + campaign.failed == synthetic_event.size
+
+
+def test_send_notifications_async(synthetic_event, fake_api, benchmark):
+    from pretix_juvare_notify import aio
+    from pretix_juvare_notify.client import build_notification, get_notification_url
+    from pretix_juvare_notify.tasks import chunked
+
+    if not aio.is_available():
+        pytest.skip("The asyncio engine needs aiohttp")
+    with scopes_disabled():
+        notifications = [
+            build_notification("Your tickets are ready.", str(phone), "benchmark")
+            for phone in Order.objects.filter(event=synthetic_event.event)
+            .order_by("pk")
+            .values_list("phone", flat=True)
+        ]
+    batches = list(chunked(notifications, 100))
+    with benchmark("send_notifications_async", synthetic_event.size, fake_api):
+        result = aio.send_notifications_async(
+            get_notification_url(fake_api.url),
+            "benchmark",
+            batches,
+            synthetic_event.event.slug,
+            timeout=(5, 30),
+            concurrency=4,
+        )
+
+    assert fake_api.requests >= len(batches)
+    assert result.sent + len(result.failed) + len(result.retry) == len(notifications)
+    assert_all_sent(fake_api, synthetic_event.size)
+
+
+def test_juvare_send_task(synthetic_event, fake_api, benchmark):
+    from pretix_juvare_notify.tasks import juvare_send_task
+
+    with scopes_disabled():
+        phones = [
+            str(phone)
+            for phone in Order.objects.filter(event=synthetic_event.event)
+            .order_by("pk")
+            .values_list("phone", flat=True)
+        ]
+    with benchmark("juvare_send_task", synthetic_event.size, fake_api):
+        for phone in phones:
+            juvare_send_task.apply(
+                kwargs={
+                    "text": "Your tickets are ready.",
+                    "to": phone,
+                    "event": synthetic_event.event.pk,
+                }
+            )
+
+    assert_all_sent(fake_api, synthetic_event.size)
+
+
+def test_juvare_order_message(synthetic_event, fake_api, benchmark):
+    from pretix_juvare_notify.models import OutboxMessage
+    from pretix_juvare_notify.signals import juvare_order_message
+    from pretix_juvare_notify.tasks import COALESCE_WINDOW, juvare_relay_outbox
+
+    with scopes_disabled():
+        orders = Order.objects.filter(event=synthetic_event.event).select_related(
+            "event"
+        )
+        with benchmark("juvare_order_message", synthetic_event.size):
+            for order in orders.iterator():
+                juvare_order_message(order, "order_paid")
+
+        OutboxMessage.objects.update(
+            created=now() - timedelta(seconds=COALESCE_WINDOW + 1)
+        )
+        with benchmark("juvare_relay_outbox", synthetic_event.size, fake_api):
+            juvare_relay_outbox.apply()
+
+        assert not OutboxMessage.objects.exists()
+    assert_all_sent(fake_api, synthetic_event.size)
+
+
+def test_juvare_periodic_reminder(synthetic_event, fake_api, benchmark):
+    from pretix_juvare_notify.models import SubEventReminder
+    from pretix_juvare_notify.signals import juvare_periodic_reminder
+
+    with benchmark("juvare_periodic_reminder", synthetic_event.size, fake_api):
+        juvare_periodic_reminder(sender=None)
+
+    with scopes_disabled():
+        assert SubEventReminder.objects.count() == len(synthetic_event.subevents)
+    assert_all_sent(fake_api, synthetic_event.size)
@@ -1 +1,165 @@
-# put your pytest fixtures here
+import json
+import pytest
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from i18nfield.strings import LazyI18nString
+from pretix.base.models import Event, Order, Organizer
+from pretix.base.settings import GlobalSettingsObject
+
+from pretix_juvare_notify.profiles import invalidate_send_profiles
+
+
+@pytest.fixture
+def organizer(db):
+    organizer = Organizer.objects.create(name="Dummy", slug="dummy")
+    organizer.settings.juvare_billing_id = "billing"
+    return organizer
+
+
+@pytest.fixture
+def event(organizer):
+    with scopes_disabled():
+        event = Event.objects.create(
+            organizer=organizer,
+            name="Dummy",
+            slug="dummy",
+            date_from=now() + timedelta(days=7),
+            plugins="pretix_juvare_notify",
+        )
+    event.settings.juvare_text_order_placed = LazyI18nString({"en": "Placed"})
+    event.settings.juvare_text_order_paid = LazyI18nString({"en": "Paid"})
+    event.settings.juvare_text_order_changed = LazyI18nString({"en": "Changed"})
+    event.settings.juvare_text_order_canceled = LazyI18nString({"en": "Canceled"})
+    event.settings.juvare_text_order_free = LazyI18nString({"en": "Free"})
+    return event
+
+
+@pytest.fixture
+def make_order(event):
+    codes = iter(range(1000, 10000))
+
+    def make_order(**kwargs):
+        kwargs.setdefault("code", f"C{next(codes)}")
+        kwargs.setdefault("status", Order.STATUS_PENDING)
+        kwargs.setdefault("total", Decimal("10.00"))
+        kwargs.setdefault("email", "dummy@example.org")
+        kwargs.setdefault("phone", "+4915112345678")
+        kwargs.setdefault("locale", "en")
+        kwargs.setdefault("expires", now() + timedelta(days=10))
+        with scopes_disabled():
+            return Order.objects.create(event=event, **kwargs)
+
+    return make_order
+
+
+@pytest.fixture
+def order(make_order):
+    return make_order()
+
+
+@pytest.fixture
+def transport(db):
+    """Sends all messages with the given test transport instead of the API."""
+
+    def set_transport(name):
+        GlobalSettingsObject().settings.juvare_transport = name
+        invalidate_send_profiles()
+
+    set_transport("null")
+    yield set_transport
+    invalidate_send_profiles()
+
+
+class FakeJuvareHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            request = server.requests
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            self.respond(server, body, request)
+        except ConnectionError:  # The client timed out and hung up
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def respond(self, server, body, request):
+        if random.random() < server.error_rate:
+            self.send_response(503)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if any(n["addresses"][0] in server.reject for n in body):
+            response = json.dumps({"message": "Invalid address"}).encode()
+            self.send_response(400)
+        else:
+            with server.lock:
+                server.notifications += len(body)
+            response = json.dumps(
+                [{"id": f"fake-{request}-{i}"} for i in range(len(body))]
+            ).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeJuvareAPI(ThreadingHTTPServer):
+    """A local stand-in for the Juvare Notify notification endpoint.
+
+    Every request is answered after ``latency`` seconds, and a share of
+    ``error_rate`` requests fails with a 503. Requests containing one of
+    the addresses in ``reject`` fail with a 400.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, error_rate=0.0, reject=()):
+        super().__init__(("127.0.0.1", 0), FakeJuvareHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reject = set(reject)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.notifications = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/"
+
+
+@pytest.fixture
+def make_fake_api():
+    """Starts a FakeJuvareAPI with the given options, and stops it after the
+    test."""
+    servers = []
+
+    def make_fake_api(**kwargs):
+        server = FakeJuvareAPI(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield make_fake_api
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from pretix_juvare_notify import aio
+from pretix_juvare_notify.client import build_notification, get_notification_url
+
+
+def notifications(*numbers):
+    return [build_notification("Hello", number, "billing") for number in numbers]
+
+
+def send(api, batches, **kwargs):
+    return aio.send_notifications_async(
+        get_notification_url(api.url), "secret", batches, "dummy", **kwargs
+    )
+
+
+def test_is_available():
+    assert aio.is_available()
+
+
+def test_concurrency_is_bounded(make_fake_api):
+    api = make_fake_api(latency=0.1)
+    batches = [notifications(f"+49151000000{i:02d}") for i in range(12)]
+    result = send(api, batches, concurrency=3)
+    assert result.sent == 12
+    assert api.requests == 12
+    assert api.max_in_flight == 3
+
+
+def test_unavailable_api_is_retried_later(make_fake_api):
+    api = make_fake_api(error_rate=1)
+    batch = notifications("+4915100000001", "+4915100000002")
+    result = send(api, [batch])
+    assert result.sent == 0
+    assert result.retry == batch
+    assert result.retry_after == 1
+    assert api.requests == 1
+
+
+def test_rejected_batch_is_split_per_notification(make_fake_api):
+    api = make_fake_api(reject={"+4915100000002"})
+    batch = notifications("+4915100000001", "+4915100000002", "+4915100000003")
+    result = send(api, [batch])
+    assert [n for n, _ in result.delivered] == [batch[0], batch[2]]
+    assert [n for n, _ in result.failed] == [batch[1]]
+    assert "Invalid address" in result.failed[0][1]
+    assert result.retry == []
+    assert api.requests == 4
+
+
+def test_read_timeout_is_retried_later(make_fake_api):
+    api = make_fake_api(latency=0.5)
+    batch = notifications("+4915100000001")
+    result = send(api, [batch], timeout=(1, 0.1))
+    assert result.sent == 0
+    assert result.retry == batch
+    assert result.retry_after is None
@@ -0,0 +1,139 @@
+import json
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Exists, OuterRef, Q
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+from pretix.base.models import Order, OrderPosition
+
+from pretix_juvare_notify.forms import SMSForm
+from pretix_juvare_notify.tasks import get_campaign_orders
+
+NOW = now().replace(second=0, microsecond=0)
+
+
+def legacy_orders(event, d):
+    """The recipient query SenderView.form_valid built before the recipients
+    were resolved in the worker."""
+    qs = Order.objects.filter(event=event)
+    statusq = Q(status__in=d["sendto"])
+    if "overdue" in d["sendto"]:
+        statusq |= Q(status=Order.STATUS_PENDING, expires__lt=now())
+    if "pa" in d["sendto"]:
+        statusq |= Q(status=Order.STATUS_PENDING, require_approval=True)
+    if "na" in d["sendto"]:
+        statusq |= Q(status=Order.STATUS_PENDING, require_approval=False)
+    orders = qs.filter(statusq)
+
+    opq = OrderPosition.objects.filter(
+        order=OuterRef("pk"),
+        canceled=False,
+        item_id__in=[i.pk for i in d.get("items")],
+    )
+    if d.get("subevent"):
+        opq = opq.filter(subevent=d.get("subevent"))
+    if d.get("subevents_from"):
+        opq = opq.filter(subevent__date_from__gte=d.get("subevents_from"))
+    if d.get("subevents_to"):
+        opq = opq.filter(subevent__date_from__lt=d.get("subevents_to"))
+    if d.get("created_from"):
+        opq = opq.filter(order__datetime__gte=d.get("created_from"))
+    if d.get("created_to"):
+        opq = opq.filter(order__datetime__lt=d.get("created_to"))
+    if d.get("items"):
+        opq = opq.filter(item__in=d["items"])
+
+    return orders.annotate(match_pos=Exists(opq)).filter(match_pos=True).distinct()
+
+
+@pytest.fixture
+def shop(event, make_order):
+    """An event series with two products, two dates and orders in all
+    states."""
+    event.has_subevents = True
+    event.save()
+    event.settings.payment_term_expire_automatically = False
+    with scopes_disabled():
+        tickets = event.items.create(name="Ticket", default_price=Decimal("10.00"))
+        merch = event.items.create(name="Merch", default_price=Decimal("5.00"))
+        soon = event.subevents.create(name="Soon", date_from=NOW + timedelta(days=2))
+        later = event.subevents.create(name="Later", date_from=NOW + timedelta(days=20))
+
+    def order(item, subevent, days_ago=1, canceled=False, **kwargs):
+        order = make_order(datetime=NOW - timedelta(days=days_ago), **kwargs)
+        with scopes_disabled():
+            order.positions.create(
+                item=item,
+                subevent=subevent,
+                price=item.default_price,
+                positionid=1,
+                canceled=canceled,
+            )
+        return order
+
+    order(tickets, soon)
+    order(tickets, later, days_ago=10)
+    order(merch, soon, days_ago=5)
+    order(tickets, soon, status=Order.STATUS_PAID)
+    order(tickets, later, status=Order.STATUS_PAID, days_ago=3)
+    order(tickets, soon, status=Order.STATUS_PAID, canceled=True)
+    order(tickets, later, status=Order.STATUS_CANCELED)
+    order(tickets, soon, status=Order.STATUS_EXPIRED)
+    order(tickets, soon, require_approval=True)
+    order(merch, later, require_approval=True, days_ago=7)
+    order(tickets, soon, expires=NOW - timedelta(days=1))
+    order(merch, later, expires=NOW - timedelta(days=1), days_ago=2)
+    return event, {"tickets": tickets, "merch": merch}, {"soon": soon, "later": later}
+
+
+def split(value):
+    return {"0": value.date().isoformat(), "1": value.time().isoformat()}
+
+
+FILTERS = {
+    "status": {"sendto": ["p"]},
+    "pending": {"sendto": ["na"]},
+    "approval": {"sendto": ["pa"]},
+    "overdue": {"sendto": ["overdue"]},
+    "all": {"sendto": ["p", "e", "c", "na", "pa", "overdue"]},
+    "item": {"sendto": ["p", "na", "pa"], "items": ["merch"]},
+    "subevent": {"sendto": ["p", "na"], "subevent": "soon"},
+    "subevent range": {
+        "sendto": ["p", "na", "pa"],
+        "subevents_from": NOW + timedelta(days=10),
+        "subevents_to": NOW + timedelta(days=30),
+    },
+    "created range": {
+        "sendto": ["p", "na", "pa"],
+        "created_from": NOW - timedelta(days=8),
+        "created_to": NOW - timedelta(days=2),
+    },
+    "combined": {
+        "sendto": ["p", "na", "overdue"],
+        "items": ["tickets"],
+        "created_from": NOW - timedelta(days=4),
+    },
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("filters", FILTERS.values(), ids=list(FILTERS))
+def test_campaign_orders_match_legacy_query(shop, filters):
+    event, items, subevents = shop
+    data = {"message_0": "Hello", "sendto": filters["sendto"]}
+    data["items"] = [items[name].pk for name in filters.get("items", items)]
+    if "subevent" in filters:
+        data["subevent"] = subevents[filters["subevent"]].pk
+    for field in ("subevents_from", "subevents_to", "created_from", "created_to"):
+        if field in filters:
+            for suffix, value in split(filters[field]).items():
+                data[f"{field}_{suffix}"] = value
+
+    with scopes_disabled():
+        form = SMSForm(data=data, event=event)
+        assert form.is_valid(), form.errors
+        expected = set(legacy_orders(event, form.cleaned_data))
+        filters = json.loads(json.dumps(form.get_filters()))
+        assert set(get_campaign_orders(event, filters)) == expected
+        assert expected
@@ -0,0 +1,47 @@
+import pytest
+from decimal import Decimal
+from django_scopes import scopes_disabled
+from i18nfield.strings import LazyI18nString
+from pretix.base.models import Order
+
+from pretix_juvare_notify import tasks
+from pretix_juvare_notify.models import Campaign, CampaignRecipient, SMSMessage
+
+
+@pytest.fixture
+def campaign(event, make_order):
+    with scopes_disabled():
+        item = event.items.create(name="Ticket", default_price=Decimal("10.00"))
+        for _ in range(3):
+            make_order(status=Order.STATUS_PAID).positions.create(
+                item=item, price=item.default_price, positionid=1
+            )
+        return Campaign.objects.create(
+            event=event,
+            message=LazyI18nString({"en": "Hello"}),
+            filters={"sendto": [Order.STATUS_PAID], "items": [item.pk]},
+        )
+
+
+def send(campaign):
+    tasks.send_bulk_sms.apply(kwargs={"campaign": campaign.pk}).get()
+    with scopes_disabled():
+        campaign.refresh_from_db()
+
+
+@pytest.mark.django_db
+def test_recipients_are_removed_after_campaign(campaign, transport):
+    send(campaign)
+    assert (campaign.queued, campaign.sent) == (3, 3)
+    with scopes_disabled():
+        assert not CampaignRecipient.objects.exists()
+        assert SMSMessage.objects.filter(campaign=campaign).count() == 3
+
+
+@pytest.mark.django_db
+def test_redelivered_campaign_is_not_sent_again(campaign, transport):
+    send(campaign)
+    send(campaign)
+    assert (campaign.queued, campaign.sent) == (3, 3)
+    with scopes_disabled():
+        assert SMSMessage.objects.filter(campaign=campaign).count() == 3
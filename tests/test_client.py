@@ -0,0 +1,133 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+from pretix_juvare_notify.client import (
+    build_notification,
+    get_retry_after,
+    handle_response,
+    send_notifications,
+    split_body,
+)
+
+
+def response(retry_after=None):
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return SimpleNamespace(headers=headers)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (None, None),
+        ("", None),
+        ("120", 120),
+        ("0", 0),
+        ("-5", 0),
+        ("soon", None),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 0),
+    ],
+)
+def test_get_retry_after(value, expected):
+    assert get_retry_after(response(value)) == expected
+
+
+def test_get_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+    assert (
+        115 <= get_retry_after(response(format_datetime(retry_at, usegmt=True))) <= 120
+    )
+
+
+def notifications(count):
+    return [
+        build_notification(f"Message {i}", f"+491511234567{i}", "billing")
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("status_code", [400, 413, 422])
+def test_handle_response_splits_rejected_batch(status_code):
+    assert handle_response(notifications(3), status_code, None, None, "event") is None
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 403, 404, 413, 422])
+def test_handle_response_fails_single_notification(status_code):
+    body = notifications(1)
+    result = handle_response(body, status_code, None, None, "event")
+    assert [notification for notification, error in result.failed] == body
+
+
+@pytest.mark.parametrize("status_code", [401, 403, 404])
+def test_handle_response_fails_whole_batch(status_code):
+    body = notifications(3)
+    result = handle_response(body, status_code, {"message": "Nope"}, None, "event")
+    assert [notification for notification, error in result.failed] == body
+    assert "Nope" in result.failed[0][1]
+
+
+@pytest.mark.parametrize("status_code", [429, 503])
+def test_handle_response_retries(status_code):
+    body = notifications(3)
+    result = handle_response(body, status_code, None, 30, "event")
+    assert result.retry == body
+    assert result.retry_after == 30
+    assert not result.failed
+
+
+def test_handle_response_per_entry_results():
+    body = notifications(2)
+    result = handle_response(
+        body, 200, [{"id": "a"}, {"error": "Invalid number"}], None, "event"
+    )
+    assert result.sent == 1
+    assert result.delivered == [(body[0], "a")]
+    assert result.failed == [(body[1], "Invalid number")]
+
+
+def test_split_body():
+    body = notifications(5)
+    assert split_body(body, 413) == [body[:2], body[2:]]
+    assert split_body(body, 400) == [[notification] for notification in body]
+
+
+class FakeSession:
+    """Answers with 413 to requests with more than ``max_size`` notifications,
+    and with 400 to requests containing ``broken``."""
+
+    def __init__(self, max_size, broken=None):
+        self.max_size = max_size
+        self.broken = broken
+        self.sizes = []
+
+    def post(self, url, data, headers, timeout):
+        body = json.loads(data)
+        self.sizes.append(len(body))
+        if len(body) > self.max_size:
+            status_code, content = 413, None
+        elif any(n["message"] == self.broken for n in body):
+            status_code, content = 400, {"message": "Invalid"}
+        else:
+            status_code, content = 200, [{"id": n["message"]} for n in body]
+        return SimpleNamespace(
+            status_code=status_code, headers={}, json=lambda: content
+        )
+
+
+def test_send_notifications_halves_too_large_batch():
+    session = FakeSession(max_size=2)
+    result = send_notifications(session, "url", "secret", notifications(5), "event")
+    assert result.sent == 5
+    assert not result.failed
+    assert session.sizes == [5, 2, 3, 1, 2]
+
+
+def test_send_notifications_sends_rejected_batch_one_by_one():
+    session = FakeSession(max_size=10, broken="Message 1")
+    body = notifications(3)
+    result = send_notifications(session, "url", "secret", body, "event")
+    assert result.sent == 2
+    assert [notification for notification, error in result.failed] == [body[1]]
+    assert session.sizes == [3, 1, 1, 1]
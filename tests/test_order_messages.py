@@ -0,0 +1,77 @@
+import pytest
+from django_scopes import scopes_disabled
+from pretix.base.models import LogEntry
+
+from pretix_juvare_notify import tasks
+from pretix_juvare_notify.client import SendResult
+from pretix_juvare_notify.models import FailedMessage
+
+SENT = "pretix_juvare_notify.message.sent"
+FAILED = "pretix_juvare_notify.message.failed"
+
+
+class FlakyTransport:
+    """Asks for a retry of all notifications the first ``failures`` times it is
+    used, and delivers them afterwards."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def send(self, profile, batches, started=None):
+        self.calls += 1
+        result = SendResult()
+        for batch in batches:
+            if self.calls <= self.failures:
+                result.retry += batch
+            else:
+                result.delivered += [(notification, None) for notification in batch]
+        result.sent = len(result.delivered)
+        return result
+
+
+def order_log(order):
+    with scopes_disabled():
+        return list(
+            LogEntry.objects.filter(
+                object_id=order.pk, action_type__in=[SENT, FAILED]
+            ).values_list("action_type", flat=True)
+        )
+
+
+def send_paid(order):
+    return tasks.juvare_order_message_task.apply(
+        kwargs={"order": order.pk, "template_name": "order_paid"}
+    ).get()
+
+
+@pytest.mark.django_db
+def test_sent_message_is_logged(order, transport):
+    assert send_paid(order)["sent"] == 1
+    assert order_log(order) == [SENT]
+
+
+@pytest.mark.django_db
+def test_message_sent_in_retry_is_logged(order, transport, monkeypatch):
+    flaky = FlakyTransport(failures=2)
+    monkeypatch.setattr(tasks, "get_transport", lambda name: flaky)
+    assert send_paid(order)["retry"] == 1
+    assert flaky.calls == 3
+    assert order_log(order) == [SENT]
+
+
+@pytest.mark.django_db
+def test_message_failing_for_good_is_logged(order, transport, monkeypatch):
+    flaky = FlakyTransport(failures=tasks.MAX_SEND_RETRIES + 1)
+    monkeypatch.setattr(tasks, "get_transport", lambda name: flaky)
+    send_paid(order)
+    assert order_log(order) == [FAILED]
+    with scopes_disabled():
+        assert FailedMessage.objects.get().order == order
+
+
+@pytest.mark.django_db
+def test_invalid_number_is_logged_as_failed(make_order, transport):
+    order = make_order(phone="+49123")
+    assert send_paid(order)["invalid"] == 1
+    assert order_log(order) == [FAILED]
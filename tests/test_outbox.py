@@ -0,0 +1,159 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+from i18nfield.strings import LazyI18nString
+from pretix.base.models import Order, OrderPayment
+
+from pretix_juvare_notify import signals, tasks
+from pretix_juvare_notify.models import OutboxMessage, SMSMessage
+
+
+def queue(order, *template_names, age=tasks.COALESCE_WINDOW):
+    """Adds messages to the outbox as the order signals do, as if they were
+    added ``age`` seconds ago."""
+    with scopes_disabled():
+        for template_name in template_names:
+            signals.juvare_order_message(order, template_name)
+        OutboxMessage.objects.filter(order=order).update(
+            created=now() - timedelta(seconds=age)
+        )
+
+
+def relay():
+    tasks.juvare_relay_outbox.apply().get()
+    with scopes_disabled():
+        return list(SMSMessage.objects.order_by("pk").values_list("text", flat=True))
+
+
+@pytest.mark.django_db
+def test_paid_supersedes_placed(order, transport):
+    queue(order, "order_placed", "order_paid")
+    assert relay() == ["Paid"]
+    with scopes_disabled():
+        assert not OutboxMessage.objects.exists()
+
+
+@pytest.mark.django_db
+def test_placed_is_not_superseded_by_earlier_paid(order, transport):
+    queue(order, "order_paid", "order_placed")
+    assert relay() == ["Paid", "Placed"]
+
+
+@pytest.mark.django_db
+def test_changed_supersedes_changed(order, transport):
+    queue(order, "order_changed", "order_changed", "order_changed")
+    assert relay() == ["Changed"]
+
+
+@pytest.mark.django_db
+def test_canceled_supersedes_everything(order, transport):
+    queue(order, "order_placed", "order_paid", "order_changed", "order_canceled")
+    assert relay() == ["Canceled"]
+
+
+@pytest.mark.django_db
+def test_messages_of_other_orders_do_not_supersede(make_order, transport):
+    queue(make_order(), "order_placed")
+    queue(make_order(), "order_paid")
+    assert relay() == ["Placed", "Paid"]
+
+
+@pytest.mark.django_db
+def test_free_order_is_never_superseded(make_order, transport):
+    order = make_order(status=Order.STATUS_PAID, total=Decimal("0.00"))
+    with scopes_disabled():
+        order.payments.create(
+            provider="free",
+            amount=Decimal("0.00"),
+            state=OrderPayment.PAYMENT_STATE_CONFIRMED,
+        )
+    queue(order, "order_placed", "order_paid")
+    assert relay() == ["Free", "Paid"]
+
+
+@pytest.mark.django_db
+def test_later_message_without_text_does_not_supersede(event, order, transport):
+    event.settings.juvare_text_order_paid = LazyI18nString({"en": ""})
+    queue(order, "order_placed", "order_paid")
+    assert relay() == ["Placed"]
+
+
+@pytest.mark.django_db
+def test_later_message_uses_text_in_order_locale(event, make_order, transport):
+    event.settings.juvare_text_order_placed = LazyI18nString(
+        {"en": "Placed", "de": "Bestellt"}
+    )
+    event.settings.juvare_text_order_paid = LazyI18nString(
+        {"en": "Paid", "de": "Bezahlt"}
+    )
+    queue(make_order(locale="de"), "order_placed", "order_paid")
+    assert relay() == ["Bezahlt"]
+
+
+@pytest.mark.django_db
+def test_messages_wait_for_coalescing_window(order, transport):
+    queue(order, "order_placed", age=tasks.COALESCE_WINDOW - 2)
+    assert relay() == []
+    with scopes_disabled():
+        assert OutboxMessage.objects.count() == 1
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def relays(monkeypatch):
+    """Records the countdowns of the queued outbox relays."""
+    clock = FakeClock()
+    monkeypatch.setattr(signals, "time", clock)
+    cache = LocMemCache("relay", {})
+    cache.clear()
+    monkeypatch.setattr(signals, "cache", cache)
+    countdowns = []
+
+    def apply_async(countdown):
+        countdowns.append((clock.now, countdown))
+
+    monkeypatch.setattr(tasks.juvare_relay_outbox, "apply_async", apply_async)
+    return clock, countdowns
+
+
+def test_relay_is_queued_once_per_window(relays):
+    clock, countdowns = relays
+    for clock.now in (1003.0, 1005.5, 1009.9):
+        signals.relay_outbox()
+    clock.now = 1010.0
+    signals.relay_outbox()
+    assert countdowns == [(1003.0, 19.0), (1010.0, 22.0)]
+
+
+def test_relay_runs_after_last_message_of_window_is_due(relays):
+    clock, countdowns = relays
+    clock.now = 1000.5
+    signals.relay_outbox()
+    last_message = 1009.99
+    ((queued, countdown),) = countdowns
+    assert queued + countdown >= last_message + tasks.COALESCE_WINDOW
+    assert queued + countdown - tasks.RELAY_MARGIN == 1020.0
+
+
+def test_relay_is_queued_again_after_broker_error(relays, monkeypatch):
+    clock, countdowns = relays
+
+    def fail(countdown):
+        raise ConnectionError()
+
+    with monkeypatch.context() as m:
+        m.setattr(tasks.juvare_relay_outbox, "apply_async", fail)
+        signals.relay_outbox()
+    assert countdowns == []
+    signals.relay_outbox()
+    assert countdowns == [(1000.0, 22.0)]
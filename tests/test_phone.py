@@ -0,0 +1,23 @@
+import pytest
+
+from pretix_juvare_notify.phone import normalize_phone
+
+
+@pytest.mark.parametrize(
+    "value,region,expected",
+    [
+        ("+4915112345678", None, "+4915112345678"),
+        ("+49 151 12345678", None, "+4915112345678"),
+        ("+49 (0)151 1234-5678", None, "+4915112345678"),
+        ("0151 12345678", "DE", "+4915112345678"),
+        ("+1 202 555 0143", "DE", "+12025550143"),
+        ("0151 12345678", None, None),
+        ("+49 123", None, None),
+        ("12345", "DE", None),
+        ("not a number", "DE", None),
+        ("", "DE", None),
+        (None, "DE", None),
+    ],
+)
+def test_normalize_phone(value, region, expected):
+    assert normalize_phone(value, region) == expected
@@ -0,0 +1,99 @@
+import pytest
+import random
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from pretix_juvare_notify import ratelimit
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now = round(self.now + seconds, 6)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    cache = LocMemCache("ratelimit", {})
+    cache.clear()
+    monkeypatch.setattr(ratelimit, "cache", cache)
+    return clock
+
+
+@pytest.mark.parametrize("rate", [1, 3, 15, 100])
+def test_capacity_per_second(clock, rate):
+    for _ in range(rate):
+        ratelimit.acquire(rate)
+    assert clock.sleeps == []
+
+    # The slot of the first requests has to leave the window
+    ratelimit.acquire(rate)
+    assert clock.sleeps == [1.1]
+    assert clock.now == 1001.1
+
+
+def test_waits_for_oldest_requests_to_leave_window(clock):
+    clock.now = 1000.25
+    ratelimit.acquire(2)
+    clock.now = 1000.55
+    ratelimit.acquire(2)
+    ratelimit.acquire(2)
+    assert clock.sleeps == [0.75]
+    assert clock.now == 1001.3
+
+
+def test_no_burst_across_second_boundary(clock):
+    clock.now = 1000.95
+    for _ in range(5):
+        ratelimit.acquire(5)
+    clock.now = 1001.0
+    ratelimit.acquire(5)
+    assert clock.sleeps == [1.0]
+    assert clock.now == 1002.0
+
+
+def test_rate_holds_in_every_second(clock):
+    rng = random.Random(42)
+    sent = []
+    for _ in range(500):
+        clock.now = round(clock.now + rng.choice([0, 0, 0.01, 0.05, 0.3]), 6)
+        ratelimit.acquire(7)
+        sent.append(clock.now)
+    for i, start in enumerate(sent):
+        assert len([t for t in sent[i:] if t < start + 1]) <= 7
+
+
+def test_throughput(clock):
+    for _ in range(700):
+        ratelimit.acquire(7)
+    # Sending is only slowed down by the granularity of the slots
+    assert 700 / (clock.now - 1000.0) > 7 * 0.9
+
+
+def test_limits_are_separate_per_rate(clock):
+    ratelimit.acquire(1)
+    ratelimit.acquire(2)
+    assert clock.sleeps == []
+
+
+@pytest.mark.parametrize("rate", [0, None, -1])
+def test_disabled(clock, rate):
+    for _ in range(10):
+        ratelimit.acquire(rate)
+    assert clock.sleeps == []
+
+
+def test_fails_open_without_counting_cache(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "cache", DummyCache("ratelimit", {}))
+    for _ in range(10):
+        ratelimit.acquire(1)
+    assert clock.sleeps == []
@@ -0,0 +1,111 @@
+import pytest
+from datetime import timedelta
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+from pretix.base.models import Event
+
+from pretix_juvare_notify.models import SubEventReminder
+from pretix_juvare_notify.signals import get_due_reminder_subevents
+
+NOW = now().replace(microsecond=0)
+
+
+@pytest.fixture
+def make_event(organizer):
+    def make_event(slug, interval=None, cutoff=None, send=True):
+        with scopes_disabled():
+            event = Event.objects.create(
+                organizer=organizer,
+                name=slug,
+                slug=slug,
+                date_from=NOW,
+                has_subevents=True,
+                plugins="pretix_juvare_notify",
+            )
+        if send:
+            event.settings.juvare_send_reminders = True
+        if interval is not None:
+            event.settings.juvare_reminder_interval = interval
+        if cutoff is not None:
+            event.settings.juvare_reminder_interval_cutoff = cutoff
+        return event
+
+    return make_event
+
+
+def add_subevent(event, hours):
+    with scopes_disabled():
+        return event.subevents.create(
+            name=f"In {hours} hours", date_from=NOW + timedelta(hours=hours)
+        )
+
+
+def due(_now=NOW):
+    with scopes_disabled():
+        return [str(subevent.name) for subevent in get_due_reminder_subevents(_now)]
+
+
+@pytest.mark.django_db
+def test_window_boundaries_are_exclusive(make_event):
+    event = make_event("window", interval=24, cutoff=2)
+    for hours in (1, 2, 3, 23, 24, 25):
+        add_subevent(event, hours)
+    assert due() == ["In 3 hours", "In 23 hours"]
+
+
+@pytest.mark.django_db
+def test_window_moves_with_time(make_event):
+    event = make_event("window", interval=24, cutoff=2)
+    add_subevent(event, 25)
+    assert due() == []
+    assert due(NOW + timedelta(hours=2)) == ["In 25 hours"]
+    assert due(NOW + timedelta(hours=23)) == []
+
+
+@pytest.mark.django_db
+def test_without_cutoff_window_starts_now(make_event):
+    event = make_event("nocutoff", interval=24)
+    add_subevent(event, -1)
+    add_subevent(event, 1)
+    assert due() == ["In 1 hours"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("interval,cutoff", [(24, 24), (2, 24), (0, 0)])
+def test_interval_not_after_cutoff_sends_nothing(make_event, interval, cutoff):
+    event = make_event("empty", interval=interval, cutoff=cutoff)
+    add_subevent(event, 1)
+    add_subevent(event, 12)
+    assert due() == []
+
+
+@pytest.mark.django_db
+def test_events_without_reminder_settings_are_skipped(make_event):
+    add_subevent(make_event("off", interval=24, send=False), 1)
+    add_subevent(make_event("defaults"), 1)
+    assert due() == []
+
+
+@pytest.mark.django_db
+def test_events_with_different_windows(make_event):
+    short = make_event("short", interval=6)
+    long = make_event("long", interval=48, cutoff=12)
+    add_subevent(short, 5)
+    add_subevent(short, 13)
+    add_subevent(long, 11)
+    add_subevent(long, 13)
+    with scopes_disabled():
+        assert [
+            (subevent.event.slug, str(subevent.name))
+            for subevent in get_due_reminder_subevents(NOW)
+        ] == [("short", "In 5 hours"), ("long", "In 13 hours")]
+
+
+@pytest.mark.django_db
+def test_subevents_with_reminder_are_skipped(make_event):
+    event = make_event("sent", interval=24)
+    sent = add_subevent(event, 3)
+    add_subevent(event, 4)
+    with scopes_disabled():
+        SubEventReminder.objects.create(subevent=sent)
+    assert due() == ["In 4 hours"]
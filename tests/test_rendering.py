@@ -0,0 +1,94 @@
+import pytest
+from pretix.base.services.mail import TolerantDict
+
+from pretix_juvare_notify.rendering import compile_template
+
+CONTEXT = {
+    "name": "Jane",
+    "event": "PyCon",
+    "total": 12.5,
+    "code": "ABC12",
+}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "No placeholders at all.",
+        "Hello {name}, see you at {event}!",
+        "{name}{event}",
+        "Unknown {placeholder} stays",
+        "{{escaped}} braces and {name}",
+        "Total: {total:.2f} EUR",
+        "Code: {code:>8}",
+        "{name!r} and {event!s} and {name!a}",
+        "{name.upper}",
+        "{code[0]}",
+    ],
+)
+def test_render_matches_format_map(text):
+    template = compile_template(text)
+    assert template.render(CONTEXT) == text.format_map(TolerantDict(CONTEXT))
+
+
+def test_placeholders():
+    template = compile_template("Hi {name}, {code[0]} {event.upper} {{literal}}")
+    assert template.placeholders == {"name", "code", "event"}
+
+
+def test_compile_template_is_cached():
+    assert compile_template("Hi {name}") is compile_template("Hi {name}")
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("Hello {name}, see you at {event}!", "Hello Jane, see you at PyCon!"),
+        ("Unknown {placeholder} stays", "Unknown {placeholder} stays"),
+        ("{{escaped}} braces and {name}", "{escaped} braces and Jane"),
+        ("Total: {total:.2f} EUR", "Total: 12.5 EUR"),
+        ("Code: {code:>8}", "Code: ABC12"),
+        ("{name!r} and {event!a}", "Jane and PyCon"),
+        ("{name.upper} {name.__class__}", "{name.upper} {name.__class__}"),
+        ("{code[0]}", "{code[0]}"),
+        ("{} and {}", "{0} and {1}"),
+        ("{name:{code}}", "Jane"),
+    ],
+)
+def test_render_safe(text, expected):
+    assert compile_template(text, safe=True).render(CONTEXT) == expected
+
+
+def test_safe_placeholders():
+    template = compile_template("Hi {name}, {code[0]} {event.upper}", safe=True)
+    assert template.placeholders == {"name", "code[0]", "event.upper"}
+
+
+def test_safe_templates_are_cached_separately():
+    assert compile_template("{name.upper}", safe=True).render(CONTEXT) == (
+        "{name.upper}"
+    )
+    assert compile_template("{name.upper}").render(CONTEXT) != "{name.upper}"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "Hello {name}, see you at {event}!",
+        "Unknown {placeholder} stays",
+        "{{escaped}} braces and {name}",
+        "Total: {total:.2f} EUR",
+        "{name!r} and {event!s}",
+        "{name.upper}",
+        "{code[0]}",
+    ],
+)
+def test_render_safe_matches_render_mail(text):
+    pytest.importorskip("pretix.helpers.format")
+    from i18nfield.strings import LazyI18nString
+    from pretix.base.services.mail import render_mail
+
+    expected = render_mail(LazyI18nString(text), CONTEXT)
+    assert compile_template(text, safe=True).render(CONTEXT) == expected
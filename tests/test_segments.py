@@ -0,0 +1,27 @@
+import pytest
+
+from pretix_juvare_notify.segments import GSM7, UCS2, analyze
+
+
+@pytest.mark.parametrize(
+    "text,encoding,length,segments",
+    [
+        ("", GSM7, 0, 0),
+        ("a" * 160, GSM7, 160, 1),
+        ("a" * 161, GSM7, 161, 2),
+        ("a" * 306, GSM7, 306, 2),
+        ("a" * 307, GSM7, 307, 3),
+        ("Grüße aus Malmö", GSM7, 15, 1),
+        ("€" * 80, GSM7, 160, 1),
+        ("€" * 80 + "a", GSM7, 161, 2),
+        ("[x]", GSM7, 5, 1),
+        ("ж" * 70, UCS2, 70, 1),
+        ("ж" * 71, UCS2, 71, 2),
+        ("ж" * 134, UCS2, 134, 2),
+        ("ж" * 135, UCS2, 135, 3),
+        ("😀" * 35, UCS2, 70, 1),
+        ("a" * 159 + "ж", UCS2, 160, 3),
+    ],
+)
+def test_analyze(text, encoding, length, segments):
+    assert analyze(text) == (encoding, length, segments)
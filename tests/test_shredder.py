@@ -0,0 +1,63 @@
+import pytest
+from django_scopes import scopes_disabled
+from pretix.base.models import LogEntry
+
+from pretix_juvare_notify.models import FailedMessage, SMSMessage
+from pretix_juvare_notify.shredder import SMSShredder
+from pretix_juvare_notify.signals import register_shredders
+
+
+def record(event, order):
+    with scopes_disabled():
+        SMSMessage.objects.create(
+            event=event,
+            order=order,
+            phone=str(order.phone),
+            text="Paid",
+            status=SMSMessage.STATUS_SENT,
+        )
+        FailedMessage.objects.create(
+            event=event, order=order, recipient=str(order.phone), text="Paid"
+        )
+        order.log_action(
+            "pretix_juvare_notify.message.sent",
+            data={
+                "message": "Paid",
+                "recipient": str(order.phone),
+                "order": order.code,
+            },
+        )
+
+
+@pytest.mark.django_db
+def test_shredder_is_registered(event):
+    assert register_shredders(event) == [SMSShredder]
+
+
+@pytest.mark.django_db
+def test_shredder_exports_and_removes_personal_data(event, order):
+    record(event, order)
+    shredder = SMSShredder(event)
+    with scopes_disabled():
+        files = {name: content for name, _, content in shredder.generate_files()}
+        assert str(order.phone) in files["juvare-sms.json"]
+        assert str(order.phone) in files["juvare-failed-sms.json"]
+
+        shredder.shred_data()
+        message = SMSMessage.objects.get()
+        assert (message.phone, message.text) == ("", "")
+        assert message.order == order
+        assert not FailedMessage.objects.exists()
+        logentry = LogEntry.objects.get(object_id=order.pk)
+        assert logentry.parsed_data["message"] == "█"
+        assert logentry.parsed_data["recipient"] == "█"
+        assert logentry.parsed_data["order"] == order.code
+
+
+@pytest.mark.django_db
+def test_messages_are_deleted_with_their_order(event, order):
+    record(event, order)
+    with scopes_disabled():
+        order.delete()
+        assert not SMSMessage.objects.exists()
+        assert not FailedMessage.objects.exists()